@@ -0,0 +1,3 @@
+Cache parsed local requirements files on disk, in the directory given by the new
+``--cache-dir`` option, or in the user cache directory. ``--no-cache-dir`` disables
+the cache.
@@ -0,0 +1,2 @@
+``pip-df sync`` writes all ``requirements*.txt`` files before replacing any of them,
+so an error leaves all of them unchanged.
@@ -0,0 +1,3 @@
+Cache remote requirements files, and revalidate them with conditional requests.
+The new ``pip-df sync`` options ``--http-cache-max-age`` and ``--offline`` use cached
+files without checking if they changed on the server.
@@ -0,0 +1,3 @@
+Download remote requirements files with one pooled http session, retrying
+failed requests. The new ``pip-df sync`` options ``--http-timeout`` and
+``--http-retries`` control this.
@@ -0,0 +1,2 @@
+Add a ``pip-df sync --parse-jobs`` option, to parse ``requirements-*.txt`` files in
+parallel processes.
@@ -0,0 +1,3 @@
+Add a ``pip-df sync --prune-constraints`` option, to pass to pip only the
+constraints of ``requirements.txt.in`` that apply to installed dependencies of the
+project.
@@ -0,0 +1,3 @@
+Installed dependencies are no longer reinstalled when their pin only differs in
+form from the constraint, such as ``1.0`` and ``1.0.0``, or URLs that differ in case
+or default port.
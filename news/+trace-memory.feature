@@ -0,0 +1,2 @@
+Add a ``--trace-memory`` option, to report the memory used by each stage of a
+command.
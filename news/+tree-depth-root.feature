@@ -0,0 +1,3 @@
+Add ``pip-df tree --depth`` and ``--root`` options, to limit the depth of the tree,
+and to print the tree of an installed distribution other than the project. In json
+output, nodes whose dependencies are cut off by ``--depth`` are marked as truncated.
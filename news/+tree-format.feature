@@ -0,0 +1,2 @@
+Add a ``pip-df tree --format`` option, to print the dependency tree as json or
+as a graphviz dot graph.
@@ -0,0 +1,2 @@
+``requirements*.txt`` files whose content does not change are left untouched,
+preserving their modification time.
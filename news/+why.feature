@@ -0,0 +1,2 @@
+Add a ``pip-df why`` command, that prints the dependency paths from the project
+to an installed distribution.
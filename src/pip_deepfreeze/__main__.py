@@ -1,13 +1,23 @@
 import shutil
 from pathlib import Path
+from typing import Optional
 
 import typer
 from packaging.utils import canonicalize_name
 
+from .http_session import HttpSession
 from .sanity import check_env
 from .sync import sync as sync_operation
-from .tree import tree as tree_operation
-from .utils import comma_split, increase_verbosity, log_debug, log_error
+from .tree import TreeFormat, tree as tree_operation
+from .utils import (
+    comma_split,
+    get_default_cache_dir,
+    increase_verbosity,
+    log_debug,
+    log_error,
+    start_memory_tracing,
+)
+from .why import why as why_operation
 
 app = typer.Typer()
 
@@ -15,6 +25,7 @@ app = typer.Typer()
 class MainOptions:
     python: str
     project_root: Path
+    cache_dir: Optional[Path]
 
 
 @app.command()
@@ -54,6 +65,55 @@ def sync(
             "If not specified, ask confirmation."
         ),
     ),
+    http_cache_max_age: float = typer.Option(
+        0,
+        "--http-cache-max-age",
+        metavar="SECONDS",
+        help=(
+            "Use cached remote requirements files younger than this without "
+            "checking if they changed on the server."
+        ),
+    ),
+    offline: bool = typer.Option(
+        False,
+        "--offline",
+        show_default=False,
+        help=(
+            "Use cached remote requirements files, however old they are, "
+            "without accessing the network."
+        ),
+    ),
+    http_timeout: float = typer.Option(
+        15,
+        "--http-timeout",
+        metavar="SECONDS",
+        help="Timeout when downloading remote requirements files.",
+    ),
+    http_retries: int = typer.Option(
+        5,
+        "--http-retries",
+        metavar="RETRIES",
+        help="Maximum number of retries when downloading remote requirements files.",
+    ),
+    parse_jobs: int = typer.Option(
+        1,
+        "--parse-jobs",
+        metavar="JOBS",
+        help=(
+            "Number of processes to use to parse requirements-*.txt files. "
+            "This may speed up projects with many extras."
+        ),
+    ),
+    prune_constraints: bool = typer.Option(
+        False,
+        "--prune-constraints",
+        show_default=False,
+        help=(
+            "Pass to pip only the constraints of requirements.txt.in that apply "
+            "to installed dependencies of the project. Installation is retried "
+            "with all constraints if new dependencies need them."
+        ),
+    ),
 ) -> None:
     """Install/update the environment to match the project requirements.
 
@@ -63,14 +123,26 @@ def sync(
     update of dependencies to to the latest version that matches
     constraints. Optionally uninstall unneeded dependencies.
     """
-    sync_operation(
-        ctx.obj.python,
-        upgrade_all,
-        comma_split(to_upgrade),
-        extras=[canonicalize_name(extra) for extra in comma_split(extras)],
-        uninstall_unneeded=uninstall_unneeded,
-        project_root=ctx.obj.project_root,
-    )
+    if ctx.obj.cache_dir is None and (offline or http_cache_max_age):
+        log_error(
+            "--offline and --http-cache-max-age cannot be used with --no-cache-dir."
+        )
+        raise typer.Exit(1)
+    with HttpSession(timeout=http_timeout, retries=http_retries) as http_session:
+        sync_operation(
+            ctx.obj.python,
+            upgrade_all,
+            comma_split(to_upgrade),
+            extras=[canonicalize_name(extra) for extra in comma_split(extras)],
+            uninstall_unneeded=uninstall_unneeded,
+            project_root=ctx.obj.project_root,
+            cache_dir=ctx.obj.cache_dir,
+            http_cache_max_age=http_cache_max_age,
+            offline=offline,
+            http_session=http_session,
+            parse_jobs=parse_jobs,
+            prune_constraints=prune_constraints,
+        )
 
 
 @app.command()
@@ -83,12 +155,60 @@ def tree(
         metavar="EXTRAS",
         help="Extras of project to consider when looking for dependencies.",
     ),
+    format: TreeFormat = typer.Option(
+        TreeFormat.text,
+        "--format",
+        help=(
+            "Output format: an indented text tree, json with one node per "
+            "line, or a graphviz dot graph."
+        ),
+    ),
+    depth: Optional[int] = typer.Option(
+        None,
+        "--depth",
+        metavar="N",
+        min=0,
+        help="Only show dependencies up to N levels below the root.",
+    ),
+    root: Optional[str] = typer.Option(
+        None,
+        "--root",
+        metavar="DIST[EXTRAS]",
+        help=(
+            "Show the dependencies of an installed distribution "
+            "instead of the project's. --extras is then ignored."
+        ),
+    ),
 ) -> None:
     """Print the installed dependencies of the project as a tree."""
     tree_operation(
         ctx.obj.python,
         project_root=ctx.obj.project_root,
         extras=[canonicalize_name(extra) for extra in comma_split(extras)],
+        format=format,
+        depth=depth,
+        root=root,
+    )
+
+
+@app.command()
+def why(
+    ctx: typer.Context,
+    dependency: str = typer.Argument(..., metavar="DEPENDENCY"),
+    extras: str = typer.Option(
+        None,
+        "--extras",
+        "-x",
+        metavar="EXTRAS",
+        help="Extras of project to consider when looking for dependencies.",
+    ),
+) -> None:
+    """Print the dependency paths from the project to DEPENDENCY."""
+    why_operation(
+        ctx.obj.python,
+        project_root=ctx.obj.project_root,
+        extras=[canonicalize_name(extra) for extra in comma_split(extras)],
+        dependency=canonicalize_name(dependency),
     )
 
 
@@ -116,12 +236,39 @@ def callback(
         resolve_path=True,
         help="The project root directory.",
     ),
+    cache_dir: Path = typer.Option(
+        None,
+        "--cache-dir",
+        file_okay=False,
+        metavar="DIR",
+        show_default=False,
+        help=(
+            "Store parsed requirements files and downloaded remote "
+            "requirements files in this directory. Defaults to a "
+            "pip-deepfreeze directory in the user cache directory."
+        ),
+    ),
+    no_cache_dir: bool = typer.Option(
+        False, "--no-cache-dir", show_default=False, help="Disable the cache."
+    ),
     verbose: bool = typer.Option(False, "--verbose", "-v", show_default=False),
+    trace_memory: bool = typer.Option(
+        False,
+        "--trace-memory",
+        show_default=False,
+        help=(
+            "Report peak and retained memory of pip-deepfreeze after each "
+            "processing stage. This is a troubleshooting tool for large "
+            "environments."
+        ),
+    ),
 ) -> None:
     """A simple pip freeze workflow for Python application developers."""
     # handle verbosity/quietness
     if verbose:
         increase_verbosity()
+    if trace_memory:
+        start_memory_tracing()
     # find python
     python_abspath = shutil.which(python)
     if not python_abspath:
@@ -135,6 +282,12 @@ def callback(
     # project directory
     ctx.obj.project_root = project_root
     log_debug(f"Looking for project in {project_root}")
+    # cache directory
+    if no_cache_dir:
+        ctx.obj.cache_dir = None
+    else:
+        ctx.obj.cache_dir = cache_dir or get_default_cache_dir()
+        log_debug(f"Using cache directory {ctx.obj.cache_dir}")
 
 
 def main() -> None:
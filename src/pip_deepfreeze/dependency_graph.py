@@ -0,0 +1,217 @@
+from array import array
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .compat import NormalizedName
+from .installed_dist import Dependency, InstalledDistribution, InstalledDistributions
+
+# bit of the extras mask that stands for the distribution itself,
+# i.e. its unconditional requirements
+BASE = 1
+
+
+class DependencyGraph:
+    """An integer indexed graph of installed distributions and their extras.
+
+    Each distribution, installed or required but not installed, has an
+    integer id. The extras of a distribution are numbered from 1, so a
+    set of extras is an integer mask, where bit 0 (``BASE``) stands for
+    the distribution itself.
+
+    The requirements of each (distribution, extra) pair are edges, stored
+    in flat arrays. An edge points to the id of the required distribution,
+    with the mask of required extras that are known extras of it.
+    """
+
+    def __init__(self, installed_dists: InstalledDistributions) -> None:
+        self.names = []  # type: List[NormalizedName]
+        self.dists = []  # type: List[Optional[InstalledDistribution]]
+        # extras of each distribution, in bit order
+        self.extras = []  # type: List[List[NormalizedName]]
+        self._ids = {}  # type: Dict[NormalizedName, int]
+        # index, in _slot_starts, of the requirements of each distribution,
+        # followed by the requirements of each of its extras
+        self._first_slot = array("l")
+        # index, in the edge arrays, of the first edge of each slot
+        self._slot_starts = array("l")
+        # edge arrays
+        self.edge_sources = array("l")
+        self.edge_targets = array("l")
+        self.edge_masks = []  # type: List[int]
+        self.edge_extras = []  # type: List[Tuple[NormalizedName, ...]]
+        self.edge_labels = []  # type: List[str]
+        # reverse index, built on demand: edges pointing to each distribution,
+        # in ranges of _reverse_edges
+        self._reverse_starts = None  # type: Optional[array[int]]
+        self._reverse_edges = None  # type: Optional[array[int]]
+        for name, installed_dist in installed_dists.items():
+            self._add_node(name, installed_dist)
+        # nodes for distributions that are not installed are added
+        # while adding edges, and have no edges themselves
+        dist_id = 0
+        while dist_id < len(self.names):
+            self._first_slot.append(len(self._slot_starts))
+            dist = self.dists[dist_id]
+            self._slot_starts.append(len(self.edge_targets))
+            if dist is not None:
+                for dep in dist.depends[None]:
+                    self._add_edge(dist_id, dep)
+                for extra in self.extras[dist_id]:
+                    self._slot_starts.append(len(self.edge_targets))
+                    for dep in dist.depends[extra]:
+                        self._add_edge(dist_id, dep)
+            dist_id += 1
+        self._slot_starts.append(len(self.edge_targets))
+
+    def _add_node(
+        self, name: NormalizedName, dist: Optional[InstalledDistribution]
+    ) -> int:
+        dist_id = len(self.names)
+        self._ids[name] = dist_id
+        self.names.append(name)
+        self.dists.append(dist)
+        self.extras.append(
+            [extra for extra in dist.depends if extra is not None] if dist else []
+        )
+        return dist_id
+
+    def _add_edge(self, source: int, dep: Dependency) -> None:
+        target = self._ids.get(dep.name)
+        if target is None:
+            target = self._add_node(dep.name, None)
+        self.edge_sources.append(source)
+        self.edge_targets.append(target)
+        self.edge_masks.append(self.extras_mask(target, dep.extras))
+        self.edge_extras.append(dep.extras)
+        self.edge_labels.append(dep.label)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def get_id(self, name: NormalizedName) -> Optional[int]:
+        return self._ids.get(name)
+
+    def is_installed(self, dist_id: int) -> bool:
+        return self.dists[dist_id] is not None
+
+    def extras_mask(self, dist_id: int, extras: Iterable[NormalizedName]) -> int:
+        """Mask of the distribution and its extras; unknown extras are ignored."""
+        mask = BASE
+        dist_extras = self.extras[dist_id]
+        for extra in extras:
+            if extra in dist_extras:
+                mask |= 1 << (dist_extras.index(extra) + 1)
+        return mask
+
+    def edges(self, dist_id: int, mask: int = BASE) -> Iterator[int]:
+        """Indices of the edges of a distribution and the extras in mask."""
+        first_slot = self._first_slot[dist_id]
+        bit = 0
+        while mask:
+            if mask & 1:
+                slot = first_slot + bit
+                for edge in range(self._slot_starts[slot], self._slot_starts[slot + 1]):
+                    yield edge
+            mask >>= 1
+            bit += 1
+
+    def closure(self, dist_id: int, mask: int = BASE) -> List[int]:
+        """Traverse the graph from a distribution and some of its extras.
+
+        Return, for each distribution id, the mask of its visited extras,
+        which is 0 if it was not reached.
+        """
+        visited = [0] * len(self.names)
+        for visited_id, visited_mask in self.expand(visited, dist_id, mask).items():
+            visited[visited_id] = visited_mask
+        return visited
+
+    def expand(self, visited: List[int], dist_id: int, mask: int) -> Dict[int, int]:
+        """Continue a traversal from a distribution and some of its extras.
+
+        Only what is not already in ``visited`` (as returned by
+        ``closure``) is traversed, and ``visited`` is not modified.
+        Return the newly visited masks, by distribution id.
+        """
+        new_visited = {}  # type: Dict[int, int]
+        stack = [(dist_id, mask)]
+        while stack:
+            dist_id, mask = stack.pop()
+            new_mask = mask & ~(visited[dist_id] | new_visited.get(dist_id, 0))
+            if not new_mask:
+                continue
+            new_visited[dist_id] = new_visited.get(dist_id, 0) | new_mask
+            for edge in self.edges(dist_id, new_mask):
+                stack.append((self.edge_targets[edge], self.edge_masks[edge]))
+        return new_visited
+
+    def _build_reverse_index(self) -> None:
+        # counting sort of edges by target
+        counts = [0] * (len(self.names) + 1)
+        for target in self.edge_targets:
+            counts[target + 1] += 1
+        for i in range(len(self.names)):
+            counts[i + 1] += counts[i]
+        reverse_starts = array("l", counts)
+        reverse_edges = array(
+            "l", bytes(len(self.edge_targets) * reverse_starts.itemsize)
+        )
+        for edge, target in enumerate(self.edge_targets):
+            reverse_edges[counts[target]] = edge
+            counts[target] += 1
+        self._reverse_starts = reverse_starts
+        self._reverse_edges = reverse_edges
+
+    def dependents(self, dist_id: int) -> Iterator[int]:
+        """Indices of the edges pointing to a distribution, with any extras."""
+        if self._reverse_starts is None or self._reverse_edges is None:
+            self._build_reverse_index()
+            assert self._reverse_starts is not None
+            assert self._reverse_edges is not None
+        for i in range(
+            self._reverse_starts[dist_id], self._reverse_starts[dist_id + 1]
+        ):
+            yield self._reverse_edges[i]
+
+    def ancestors(self, dist_id: int) -> List[bool]:
+        """Flag the distributions that depend on a distribution, and itself."""
+        reached = [False] * len(self.names)
+        reached[dist_id] = True
+        queue = deque([dist_id])
+        while queue:
+            dist_id = queue.popleft()
+            for edge in self.dependents(dist_id):
+                source = self.edge_sources[edge]
+                if not reached[source]:
+                    reached[source] = True
+                    queue.append(source)
+        return reached
+
+    def paths(self, dist_id: int, mask: int, target: int) -> Iterator[List[int]]:
+        """Find the paths from a distribution and some of its extras to another.
+
+        Paths are lists of edge indices, without cycles, shortest first. An
+        edge from an extra of a distribution is only followed if the previous
+        edge required that extra.
+        """
+        ancestors = self.ancestors(target)
+        if not ancestors[dist_id]:
+            return
+        queue = deque(
+            [(dist_id, mask, [], {dist_id})]
+        )  # type: Deque[Tuple[int, int, List[int], Set[int]]]
+        while queue:
+            dist_id, mask, path, path_ids = queue.popleft()
+            for edge in self.edges(dist_id, mask):
+                edge_target = self.edge_targets[edge]
+                if edge_target == target:
+                    yield path + [edge]
+                elif ancestors[edge_target] and edge_target not in path_ids:
+                    queue.append(
+                        (
+                            edge_target,
+                            self.edge_masks[edge],
+                            path + [edge],
+                            path_ids | {edge_target},
+                        )
+                    )
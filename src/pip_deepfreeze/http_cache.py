@@ -0,0 +1,96 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from .http_session import HttpSession
+from .req_file_parser import HttpResponse
+from .utils import store_cache_entry
+
+
+def _strip_userinfo(url: str) -> str:
+    """Remove credentials from url, so they are not written to the cache."""
+    parts = urlsplit(url)
+    return urlunsplit(parts._replace(netloc=parts.netloc.rpartition("@")[2]))
+
+
+class CachedHttpResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+    def raise_for_status(self) -> None:
+        pass
+
+
+class CachingHttpClient:
+    """An http client that caches responses on disk.
+
+    Cached responses are revalidated with conditional requests using
+    their ETag and Last-Modified headers, unless they are younger than
+    ``max_age`` seconds. In ``offline`` mode, cached responses are
+    returned without revalidation, however old they are. Entries are
+    keyed by url without user and password, which are not stored.
+    """
+
+    def __init__(
+        self,
+        client: HttpSession,
+        cache_dir: Path,
+        max_age: float = 0,
+        offline: bool = False,
+    ):
+        self.client = client
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.offline = offline
+
+    def _entry_path(self, url: str) -> Path:
+        # url has no userinfo
+        return self.cache_dir / (hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+    def _load(self, url: str) -> Optional[Dict[str, Any]]:
+        try:
+            entry = json.loads(self._entry_path(url).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            # missing or corrupted entry
+            return None
+        if not isinstance(entry, dict) or entry.get("url") != url:
+            return None
+        return entry
+
+    def _store(self, url: str, entry: Dict[str, Any]) -> None:
+        store_cache_entry(self._entry_path(url), entry)
+
+    def get(self, url: str) -> HttpResponse:
+        cache_url = _strip_userinfo(url)
+        entry = self._load(cache_url)
+        if entry is not None:
+            if self.offline or time.time() - entry["fetched"] < self.max_age:
+                return CachedHttpResponse(entry["text"])
+        elif self.offline:
+            raise RuntimeError(f"{cache_url} is not in the http cache (offline mode)")
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        resp = self.client.get(url, headers=headers)
+        if resp.status_code == 304 and entry is not None:
+            entry["fetched"] = time.time()
+            self._store(cache_url, entry)
+            return CachedHttpResponse(entry["text"])
+        if resp.is_success:
+            self._store(
+                cache_url,
+                {
+                    "url": cache_url,
+                    "etag": resp.headers.get("ETag"),
+                    "last_modified": resp.headers.get("Last-Modified"),
+                    "fetched": time.time(),
+                    "text": resp.text,
+                },
+            )
+        return resp
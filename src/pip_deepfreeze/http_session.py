@@ -0,0 +1,59 @@
+import importlib.util
+import time
+from types import TracebackType
+from typing import Mapping, Optional, Type
+
+import httpx
+
+# statuses that are worth retrying, as pip does
+_RETRY_STATUSES = {500, 502, 503, 504}
+
+
+def _has_http2() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+class HttpSession:
+    """The http client shared by all requirements files parsing of a command.
+
+    It pools connections (using HTTP/2 if the h2 package is installed),
+    and retries failed requests with exponential backoff. It must be
+    closed after use, which is done when used as a context manager.
+    """
+
+    def __init__(
+        self, timeout: float = 15, retries: int = 5, backoff_factor: float = 0.25
+    ):
+        self.client = httpx.Client(timeout=timeout, http2=_has_http2())
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+
+    def get(
+        self, url: str, headers: Optional[Mapping[str, str]] = None
+    ) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                resp = self.client.get(url, headers=headers)
+            except httpx.TransportError:
+                if attempt >= self.retries:
+                    raise
+            else:
+                if resp.status_code not in _RETRY_STATUSES or attempt >= self.retries:
+                    return resp
+            time.sleep(self.backoff_factor * (2**attempt))
+            attempt += 1
+
+    def close(self) -> None:
+        self.client.close()
+
+    def __enter__(self) -> "HttpSession":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
 
 from packaging.requirements import Requirement
 from packaging.utils import canonicalize_name
@@ -21,41 +21,99 @@ class DirectUrl:
             return str(url)
 
 
+class Dependency(NamedTuple):
+    """A requirement of an installed distribution, with markers evaluated."""
+
+    name: NormalizedName
+    extras: Tuple[NormalizedName, ...]
+    # the requirement as written, without version specifier nor marker
+    label: str
+
+
 class InstalledDistribution:
-    def __init__(self, data: Dict[str, Any]):
-        self.data = data
+    """An installed distribution, as reported by pip_list_json.
 
-    @property
-    def name(self) -> NormalizedName:
-        return canonicalize_name(self.data["metadata"]["name"])
+    Names are canonicalized once, on creation. Rarely used fields are
+    decoded on first access.
+    """
 
-    @property
-    def version(self) -> str:
-        version = self.data["metadata"]["version"]
+    __slots__ = (
+        "name",
+        "version",
+        "depends",
+        "_requires_dist",
+        "_direct_url",
+        "_requires",
+        "_extra_requires",
+    )
+
+    def __init__(self, data: Dict[str, Any]):
+        metadata = data["metadata"]
+        version = metadata["version"]
         assert isinstance(version, str)
-        return version
+        self.name = canonicalize_name(metadata["name"])  # type: NormalizedName
+        self.version = version  # type: str
+        # dependencies, by extra of this distribution, None being the
+        # unconditional ones
+        self.depends = {
+            None: []
+        }  # type: Dict[Optional[NormalizedName], List[Dependency]]
+        for extra in metadata.get("provides_extra", []):
+            self.depends[canonicalize_name(extra)] = []
+        for name, extras, extra in data.get("depends", []):
+            label = f"{name}[{','.join(extras)}]" if extras else name
+            self.depends.setdefault(
+                canonicalize_name(extra) if extra else None, []
+            ).append(
+                Dependency(
+                    canonicalize_name(name),
+                    tuple(sorted(canonicalize_name(e) for e in extras)),
+                    label,
+                )
+            )
+        # raw data, replaced by the decoded value on first access
+        self._requires_dist = metadata.get(
+            "requires_dist", []
+        )  # type: Union[List[str], List[Requirement]]
+        self._direct_url = data.get(
+            "direct_url"
+        )  # type: Union[Dict[str, Any], DirectUrl, None]
+        # built from depends on first access
+        self._requires = None  # type: Optional[List[Requirement]]
+        self._extra_requires = (
+            None
+        )  # type: Optional[Dict[NormalizedName, List[Requirement]]]
 
     @property
     def direct_url(self) -> Optional[DirectUrl]:
-        direct_url = self.data.get("direct_url")
-        if direct_url is None:
-            return None
-        return DirectUrl(direct_url)
+        if isinstance(self._direct_url, dict):
+            self._direct_url = DirectUrl(self._direct_url)
+        return self._direct_url
 
     @property
     def requires_dist(self) -> List[Requirement]:
-        return [Requirement(r) for r in self.data["metadata"].get("requires_dist", [])]
+        requires_dist = [
+            req if isinstance(req, Requirement) else Requirement(req)
+            for req in self._requires_dist
+        ]
+        self._requires_dist = requires_dist
+        return requires_dist
 
     @property
     def requires(self) -> List[Requirement]:
-        return [Requirement(req) for req in self.data.get("requires", [])]
+        if self._requires is None:
+            self._requires = [Requirement(dep.label) for dep in self.depends[None]]
+        return self._requires
 
     @property
     def extra_requires(self) -> Dict[NormalizedName, List[Requirement]]:
-        return {
-            canonicalize_name(extra): [Requirement(req) for req in reqs]
-            for extra, reqs in self.data.get("extra_requires", {}).items()
-        }
+        if self._extra_requires is None:
+            self._extra_requires = {
+                extra: [Requirement(dep.label) for dep in deps]
+                for extra, deps in self.depends.items()
+                if extra is not None
+            }
+        return self._extra_requires
 
 
 InstalledDistributions = Dict[NormalizedName, InstalledDistribution]
@@ -1,13 +1,40 @@
-from typing import Dict, Optional, Sequence, Set
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
 from packaging.requirements import Requirement
 from packaging.utils import canonicalize_name
 
 from .compat import NormalizedName
+from .dependency_graph import BASE, DependencyGraph
 from .installed_dist import InstalledDistributions
 from .utils import make_project_name_with_extras
 
 
+def _installed_depends(
+    graph: DependencyGraph,
+    project_name: NormalizedName,
+    extras: Optional[Sequence[NormalizedName]] = None,
+) -> Set[NormalizedName]:
+    project_id = graph.get_id(project_name)
+    if project_id is None or not graph.is_installed(project_id):
+        return set()
+    req = Requirement(make_project_name_with_extras(project_name, extras))
+    visited = graph.closure(
+        project_id,
+        graph.extras_mask(project_id, (canonicalize_name(e) for e in req.extras)),
+    )
+    return _visited_names(graph, project_id, enumerate(visited))
+
+
+def _visited_names(
+    graph: DependencyGraph, project_id: int, visited: Iterable[Tuple[int, int]]
+) -> Set[NormalizedName]:
+    return {
+        graph.names[dist_id]
+        for dist_id, mask in visited
+        if mask and dist_id != project_id and graph.is_installed(dist_id)
+    }
+
+
 def list_installed_depends(
     installed_dists: InstalledDistributions,
     project_name: NormalizedName,
@@ -18,40 +45,7 @@ def list_installed_depends(
     Return canonicalized distribution names, excluding the project
     itself.
     """
-    res = set()
-    seen = set()
-
-    def add(req: Requirement, deps_only: bool) -> None:
-        req_name = canonicalize_name(req.name)
-        seen_key = (req_name, tuple(sorted(req.extras)))
-        if seen_key in seen:
-            return
-        seen.add(seen_key)
-        try:
-            dist = installed_dists[req_name]
-        except KeyError:
-            # not installed
-            return
-        else:
-            if not deps_only:
-                res.add(req_name)
-            for dep_req in dist.requires:
-                add(dep_req, deps_only=False)
-            for extra in req.extras:
-                extra = canonicalize_name(extra)
-                if extra not in dist.extra_requires:
-                    # extra is not a known extra of installed dist,
-                    # so we can't report it's dependencies
-                    continue
-                for dep_req in dist.extra_requires[extra]:
-                    add(dep_req, deps_only=False)
-
-    add(
-        Requirement(make_project_name_with_extras(project_name, extras)),
-        deps_only=True,
-    )
-
-    return res
+    return _installed_depends(DependencyGraph(installed_dists), project_name, extras)
 
 
 def list_installed_depends_by_extra(
@@ -59,10 +53,48 @@ def list_installed_depends_by_extra(
     project_name: NormalizedName,
 ) -> Dict[Optional[NormalizedName], Set[NormalizedName]]:
     """Get installed dependencies of a project, grouped by extra."""
+    extras, depends_masks = list_installed_depends_masks(installed_dists, project_name)
+    bit_extras = [None] + extras  # type: List[Optional[NormalizedName]]
     res = {}  # type: Dict[Optional[NormalizedName], Set[NormalizedName]]
-    base_depends = list_installed_depends(installed_dists, project_name)
-    res[None] = base_depends
-    for extra in installed_dists[project_name].extra_requires:
-        extra_depends = list_installed_depends(installed_dists, project_name, [extra])
-        res[extra] = extra_depends - base_depends
+    for bit, extra in enumerate(bit_extras):
+        res[extra] = {name for name, mask in depends_masks.items() if mask & (1 << bit)}
     return res
+
+
+def list_installed_depends_masks(
+    installed_dists: InstalledDistributions,
+    project_name: NormalizedName,
+) -> Tuple[List[NormalizedName], Dict[NormalizedName, int]]:
+    """Get installed dependencies of a project, with the extras requiring them.
+
+    Return the extras of the project, and a mask by dependency name,
+    with bit 0 (``BASE``) set for the dependencies of the project
+    itself, and bit i set for dependencies of the i-th extra that are
+    not dependencies of the project itself.
+
+    The dependencies of the project are traversed once, then the
+    traversal is continued from each extra, visiting only what the
+    extra adds.
+    """
+    graph = DependencyGraph(installed_dists)
+    project_id = graph.get_id(project_name)
+    assert project_id is not None and graph.is_installed(project_id)
+    visited = graph.closure(project_id)
+    depends_masks = {
+        name: BASE for name in _visited_names(graph, project_id, enumerate(visited))
+    }
+    extras = graph.extras[project_id]
+    for bit in range(1, len(extras) + 1):
+        new_visited = graph.expand(visited, project_id, 1 << bit)
+        # only distributions that were not reached by the base traversal
+        for name in _visited_names(
+            graph,
+            project_id,
+            (
+                (dist_id, mask)
+                for dist_id, mask in new_visited.items()
+                if not visited[dist_id]
+            ),
+        ):
+            depends_masks[name] = depends_masks.get(name, 0) | (1 << bit)
+    return extras, depends_masks
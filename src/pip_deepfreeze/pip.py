@@ -3,19 +3,25 @@ from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 from .compat import NormalizedName, resource_path, shlex_join
+from .dependency_graph import BASE
 from .installed_dist import InstalledDistribution, InstalledDistributions
-from .list_installed_depends import (
-    list_installed_depends,
-    list_installed_depends_by_extra,
-)
+from .list_installed_depends import list_installed_depends, list_installed_depends_masks
 from .project_name import get_project_name
 from .req_file_parser import (
     NestedRequirementsLine,
     RequirementLine,
     parse as parse_req_file,
 )
-from .req_parser import get_req_name
-from .utils import check_call, check_output, log_debug, log_info, log_warning
+from .req_parser import get_req_name, requirements_equivalent
+from .utils import (
+    check_call,
+    check_output,
+    log_debug,
+    log_info,
+    log_memory,
+    log_warning,
+    trace_memory,
+)
 
 
 def pip_upgrade_project(
@@ -51,14 +57,15 @@ def pip_upgrade_project(
     """
     # 1. parse constraints
     constraint_reqs = {}
-    for req_line in parse_req_file(
-        str(constraints_filename), recurse=False, reqs_only=False
-    ):
-        assert not isinstance(req_line, NestedRequirementsLine)
-        if isinstance(req_line, RequirementLine):
-            req_name = get_req_name(req_line.requirement)
-            assert req_name  # XXX user error instead?
-            constraint_reqs[req_name] = req_line.requirement
+    with trace_memory("constraints parsing"):
+        for req_line in parse_req_file(
+            str(constraints_filename), recurse=False, reqs_only=False
+        ):
+            assert not isinstance(req_line, NestedRequirementsLine)
+            if isinstance(req_line, RequirementLine):
+                req_name = get_req_name(req_line.requirement)
+                assert req_name  # XXX user error instead?
+                constraint_reqs[req_name] = req_line.requirement
     # 2. get installed frozen dependencies of project
     installed_reqs = {
         get_req_name(req_line): req_line
@@ -71,7 +78,9 @@ def pip_upgrade_project(
         assert installed_req_name
         if installed_req_name not in constraint_reqs:
             to_uninstall.add(installed_req_name)
-        elif installed_req != constraint_reqs[installed_req_name]:
+        elif not requirements_equivalent(
+            installed_req, constraint_reqs[installed_req_name]
+        ):
             to_uninstall.add(installed_req_name)
     if to_uninstall:
         to_uninstall_str = ",".join(to_uninstall)
@@ -105,7 +114,12 @@ def pip_list(python: str) -> InstalledDistributions:
     pip feature in the future.
     """
     with resource_path("pip_deepfreeze", "pip_list_json.py") as pip_list_json:
-        json_dists = json.loads(check_output([python, str(pip_list_json)]))
+        output = check_output([python, str(pip_list_json)])
+    log_memory(f"pip_list_json.py output: {len(output)} characters")
+    with trace_memory("pip list json decoding"):
+        json_dists = json.loads(output)
+    del output
+    with trace_memory("installed distributions construction"):
         dists = [InstalledDistribution(json_dist) for json_dist in json_dists]
         return {dist.name: dist for dist in dists}
 
@@ -128,7 +142,11 @@ def pip_freeze_dependencies(
     are ignored.
     """
     project_name = get_project_name(python, project_root)
-    dependencies_names = list_installed_depends(pip_list(python), project_name, extras)
+    installed_dists = pip_list(python)
+    with trace_memory("dependency graph traversal"):
+        dependencies_names = list_installed_depends(
+            installed_dists, project_name, extras
+        )
     frozen_reqs = pip_freeze(python)
     dependencies_reqs = []
     unneeded_reqs = []
@@ -157,16 +175,22 @@ def pip_freeze_dependencies_by_extra(
     Unnamed requirements are ignored.
     """
     project_name = get_project_name(python, project_root)
-    dependencies_by_extras = list_installed_depends_by_extra(
-        pip_list(python), project_name
-    )
+    installed_dists = pip_list(python)
+    with trace_memory("dependency graph traversal"):
+        project_extras, depends_masks = list_installed_depends_masks(
+            installed_dists, project_name
+        )
     frozen_reqs = pip_freeze(python)
     dependencies_reqs = {}  # type: Dict[Optional[NormalizedName], List[str]]
+    # extras by bit of depends_masks, and mask of the selected extras
+    bit_extras = [None] + project_extras  # type: List[Optional[NormalizedName]]
+    extras_mask = 0
     for extra in extras:
-        if extra not in dependencies_by_extras:
+        if extra not in project_extras:
             log_warning(f"{extra} is not an extra of {project_name}")
             continue
         dependencies_reqs[extra] = []
+        extras_mask |= 1 << bit_extras.index(extra)
     dependencies_reqs[None] = []
     unneeded_reqs = []
     for frozen_req in frozen_reqs:
@@ -175,17 +199,17 @@ def pip_freeze_dependencies_by_extra(
             continue
         if frozen_req_name == project_name:
             continue
-        unneeded = True
-        if frozen_req_name in dependencies_by_extras[None]:
-            unneeded = False
+        mask = depends_masks.get(frozen_req_name, 0)
+        if mask & BASE:
             dependencies_reqs[None].append(frozen_req)
-        else:
-            for extra in extras:
-                if frozen_req_name in dependencies_by_extras.get(extra, []):
-                    unneeded = False
-                    dependencies_reqs[extra].append(frozen_req)
-        if unneeded:
+            continue
+        mask &= extras_mask
+        if not mask:
             unneeded_reqs.append(frozen_req)
+            continue
+        for bit in range(1, mask.bit_length()):
+            if mask & (1 << bit):
+                dependencies_reqs[bit_extras[bit]].append(frozen_req)
     return dependencies_reqs, unneeded_reqs
 
 
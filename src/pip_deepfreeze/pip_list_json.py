@@ -13,19 +13,16 @@ import json
 import sys
 
 try:
-    from typing import Any, Dict
+    from typing import Any, Dict, List, Optional
 except ImportError:
     pass
 
 import pkg_resources
 
 
-def _req_name_with_extras(req):
-    # type: (pkg_resources.Requirement) -> str
-    if req.extras:
-        return "{}[{}]".format(req.project_name, ",".join(sorted(req.extras)))
-    else:
-        return req.project_name
+def _edge(req, extra):
+    # type: (pkg_resources.Requirement, Optional[str]) -> List[Any]
+    return [req.project_name, sorted(req.extras), extra]
 
 
 def main():
@@ -47,28 +44,24 @@ def main():
         if dist.has_metadata("direct_url.json"):
             direct_url = json.loads(dist.get_metadata("direct_url.json"))
             rec["direct_url"] = direct_url
-        # requires/extra_requires
+        # depends: the requirements of dist, with environment markers
+        # evaluated, as [name, extras, extra] edges where extra is the extra
+        # of dist that enables the requirement, or None
         # XXX: this part would not be necessary if `packaging` had a way
         #      to check the extra marker without evaluating with the full
         #      environment
-        requires = []
-        requires_set = set()
-        for dep in dist.requires():
-            requires.append(_req_name_with_extras(dep))
-            requires_set.add(dep.key)
-        if requires:
-            rec["requires"] = requires
-        if dist.extras:
-            extra_requires = {}
-            for extra in dist.extras:
-                extra_requires[extra] = [
-                    _req_name_with_extras(dep)
-                    for dep in dist.requires((extra,))
-                    if dep.key not in requires_set
-                ]
-            rec["extra_requires"] = extra_requires
+        requires = dist.requires()
+        depends = [_edge(dep, None) for dep in requires]
+        requires_set = set(dep.key for dep in requires)
+        for extra in sorted(dist.extras):
+            # dist.requires() returns the base requirements first
+            for dep in dist.requires((extra,))[len(requires) :]:
+                if dep.key not in requires_set:
+                    depends.append(_edge(dep, extra))
+        if depends:
+            rec["depends"] = depends
         recs.append(rec)
-    json.dump(recs, sys.stdout, indent=2)
+    json.dump(recs, sys.stdout, separators=(",", ":"))
     sys.stdout.write("\n")
 
 
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Iterable, List, Optional
+
+from .req_file_parser import (
+    _ENV_VAR_RE,
+    NestedRequirementsLine,
+    OptionsLine,
+    ParsedLine,
+    RequirementLine,
+    RequirementsFileParserError,
+    _iter_file_lines,
+)
+from .utils import store_cache_entry
+
+# bump this when the parser output or the cache entry format changes
+_CACHE_VERSION = 3
+
+# line types in cache entries
+_PARSED = 0
+_REQUIREMENT = 1
+_NESTED = 2
+_OPTIONS = 3
+
+
+def _line_to_json(line: ParsedLine) -> List[Any]:
+    if isinstance(line, RequirementLine):
+        return [
+            _REQUIREMENT,
+            line.lineno,
+            line.raw_line,
+            line.requirement,
+            line.is_editable,
+            line.is_constraint,
+            line.options,
+        ]
+    elif isinstance(line, NestedRequirementsLine):
+        return [
+            _NESTED,
+            line.lineno,
+            line.raw_line,
+            line.requirements,
+            line.is_constraint,
+        ]
+    elif isinstance(line, OptionsLine):
+        return [_OPTIONS, line.lineno, line.raw_line, line.options]
+    return [_PARSED, line.lineno, line.raw_line]
+
+
+def _line_from_json(filename: str, data: List[Any]) -> ParsedLine:
+    line_type = data[0]
+    if line_type == _REQUIREMENT:
+        return RequirementLine(
+            filename,
+            data[1],
+            data[2],
+            requirement=data[3],
+            is_editable=data[4],
+            is_constraint=data[5],
+            options=data[6],
+        )
+    elif line_type == _NESTED:
+        return NestedRequirementsLine(
+            filename,
+            data[1],
+            data[2],
+            requirements=data[3],
+            is_constraint=data[4],
+        )
+    elif line_type == _OPTIONS:
+        return OptionsLine(filename, data[1], data[2], options=data[3])
+    return ParsedLine(filename, data[1], data[2])
+
+
+def _lines_sha256(lines: Iterable[str]) -> str:
+    sha256 = hashlib.sha256()
+    for line in lines:
+        sha256.update(line.encode("utf-8"))
+        sha256.update(b"\n")
+    return sha256.hexdigest()
+
+
+class ParsedLinesDiskCache:
+    """A persistent cache of parsed lines of local requirements files.
+
+    There is one entry per file, which is valid as long as the file path,
+    size, modification time and content hash are unchanged. The file is
+    only read, to check its content hash, when its size and modification
+    time match. Files that reference environment variables are not cached,
+    as their values are often credentials.
+
+    Entries do not include the content of nested requirements files, as
+    these have their own entries, which are validated when the parser
+    recurses into them. So a change to an included file invalidates only
+    that file, and is still seen by all files that include it.
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+
+    def _entry_path(self, filename: str, constraints: bool, strict: bool) -> Path:
+        key = json.dumps([os.path.abspath(filename), constraints, strict])
+        return self.cache_dir / (hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+    def get(
+        self, filename: str, constraints: bool, strict: bool
+    ) -> Optional[List[ParsedLine]]:
+        entry_path = self._entry_path(filename, constraints, strict)
+        try:
+            entry = json.loads(entry_path.read_text(encoding="utf-8"))
+            identity = entry["identity"]
+            st = os.stat(filename)
+            if (
+                identity["version"] != _CACHE_VERSION
+                or identity["path"] != os.path.abspath(filename)
+                or identity["size"] != st.st_size
+                or identity["mtime"] != st.st_mtime_ns
+            ):
+                return None
+            if _lines_sha256(_iter_file_lines(filename)) != identity["sha256"]:
+                return None
+            return [_line_from_json(filename, line) for line in entry["lines"]]
+        except (
+            OSError,
+            ValueError,
+            KeyError,
+            TypeError,
+            IndexError,
+            RequirementsFileParserError,
+        ):
+            # missing or corrupted entry, or unreadable file
+            return None
+
+    def set(
+        self,
+        filename: str,
+        constraints: bool,
+        strict: bool,
+        parsed_lines: List[ParsedLine],
+    ) -> None:
+        entry_path = self._entry_path(filename, constraints, strict)
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return
+        if any(_ENV_VAR_RE.search(line.raw_line) for line in parsed_lines):
+            # parsed lines have environment variables expanded, and these
+            # often hold credentials, which must not be written to disk
+            try:
+                entry_path.unlink()
+            except OSError:
+                pass
+            return
+        # the raw lines of the parsed lines are the lines of the file, so
+        # the content hash is the hash of what was actually parsed
+        entry = {
+            "identity": {
+                "version": _CACHE_VERSION,
+                "path": os.path.abspath(filename),
+                "size": st.st_size,
+                "mtime": st.st_mtime_ns,
+                "sha256": _lines_sha256(line.raw_line for line in parsed_lines),
+            },
+            "lines": [_line_to_json(line) for line in parsed_lines],
+        }
+        store_cache_entry(entry_path, entry)
@@ -16,12 +16,26 @@ from __future__ import absolute_import
 
 import argparse
 import codecs
+import io
 import locale
 import os
 import re
 import shlex
 import sys
-from typing import Iterable, Iterator, List, NoReturn, Optional, Text, Tuple, Union
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NoReturn,
+    Optional,
+    Set,
+    Text,
+    Tuple,
+    Union,
+)
 from urllib import parse as urllib_parse
 from urllib.request import urlopen
 
@@ -39,6 +53,7 @@ __all__ = [
     "RequirementLine",
     "NestedRequirementsLine",
     "OptionsLine",
+    "ParsedLinesCache",
 ]
 
 _SCHEME_RE = re.compile(r"^(http|https|file):", re.I)
@@ -49,6 +64,10 @@ _URL_SLASH_DRIVE_RE = re.compile(r"/*([a-z])\|", re.I)
 # (underscore). This follows the POSIX standard defined in IEEE Std 1003.1,
 # 2013 Edition.
 _ENV_VAR_RE = re.compile(r"(?P<var>\$\{(?P<name>[A-Z0-9_]+)\})")
+# Matches lines that have at least one space separated token starting with '-',
+# which are the only ones that need to go through the options parser
+# (see _break_args_options).
+_OPTION_TOKEN_RE = re.compile(r"(?:^| )-")
 
 
 class HttpResponse(Protocol):
@@ -56,7 +75,7 @@ class HttpResponse(Protocol):
     def text(self) -> str:
         """The text content of the response."""
 
-    def raise_for_status(self) -> None:
+    def raise_for_status(self) -> object:
         """Raise if the response has an http error status."""
 
 
@@ -65,6 +84,25 @@ class HttpClient(Protocol):
         """HTTP GET the URL."""
 
 
+class ParsedLinesCache(Protocol):
+    def get(
+        self, filename: str, constraints: bool, strict: bool
+    ) -> Optional[List["ParsedLine"]]:
+        """Get the parsed lines of a local file, or None if not in cache.
+
+        None is also returned if the file changed since it was cached.
+        """
+
+    def set(
+        self,
+        filename: str,
+        constraints: bool,
+        strict: bool,
+        parsed_lines: List["ParsedLine"],
+    ) -> None:
+        """Store the parsed lines of a local file."""
+
+
 class RequirementsFileParserError(Exception):
     pass
 
@@ -80,18 +118,24 @@ class OptionParsingError(RequirementsFileParserError):
 
 
 class ParsedLine(object):
+    # slots, because large files produce many instances
+    __slots__ = ("filename", "lineno", "raw_line")
+
     def __init__(
         self,
         filename,  # type: str
         lineno,  # type: int
         raw_line,  # type: str
     ):
-        self.filename = filename
+        # all lines of a file share the same filename string
+        self.filename = sys.intern(filename)
         self.lineno = lineno
         self.raw_line = raw_line
 
 
 class RequirementLine(ParsedLine):
+    __slots__ = ("requirement", "is_editable", "is_constraint", "options")
+
     def __init__(
         self,
         filename,  # type: str
@@ -110,6 +154,8 @@ class RequirementLine(ParsedLine):
 
 
 class NestedRequirementsLine(ParsedLine):
+    __slots__ = ("requirements", "is_constraint")
+
     def __init__(
         self,
         filename,  # type: str
@@ -124,6 +170,8 @@ class NestedRequirementsLine(ParsedLine):
 
 
 class OptionsLine(ParsedLine):
+    __slots__ = ("options",)
+
     def __init__(
         self,
         filename,  # type: str
@@ -137,11 +185,47 @@ class OptionsLine(ParsedLine):
 
 def _preprocess_lines(lines):
     # type: (Iterable[str]) -> ReqFileLines
-    """Split, filter, and join lines, and return a line iterator."""
-    lines_enum = _join_lines(enumerate(lines, start=1))
-    lines_enum = _remove_comments(lines_enum)
-    lines_enum = _expand_env_variables(lines_enum)
-    return lines_enum
+    """Join, strip comments and expand environment variables in a single pass.
+
+    Return an iterator of (line number, preprocessed line, raw line). A
+    line ending in '\\' is joined with the next line (except when
+    following comments), and the joined line takes on the number of the
+    first line.
+    """
+    primary_line_number = None
+    new_lines = []  # type: List[Text]
+    raw_lines = []  # type: List[Text]
+    for line_number, raw_line in enumerate(lines, start=1):
+        raw_line = raw_line.rstrip("\n")  # in case lines comes from open()
+        is_comment = "#" in raw_line and _COMMENT_RE.match(raw_line)
+        if raw_line.endswith("\\") and not is_comment:
+            if not new_lines:
+                primary_line_number = line_number
+            new_lines.append(raw_line.strip("\\"))
+            raw_lines.append(raw_line)
+        elif new_lines:
+            # this ensures comments are always matched
+            new_lines.append(" " + raw_line if is_comment else raw_line)
+            raw_lines.append(raw_line)
+            assert primary_line_number is not None
+            yield (
+                primary_line_number,
+                _clean_line("".join(new_lines)),
+                "\n".join(raw_lines),
+            )
+            new_lines = []
+            raw_lines = []
+        elif is_comment:
+            yield line_number, "", raw_line
+        else:
+            yield line_number, _clean_line(raw_line), raw_line
+
+    # last line contains \
+    if new_lines:
+        assert primary_line_number is not None
+        yield primary_line_number, _clean_line("".join(new_lines)), "\n".join(raw_lines)
+
+    # TODO (from pip codebase): handle space after '\'.
 
 
 def parse(
@@ -151,16 +235,33 @@ def parse(
     strict=False,  # type: bool
     constraints=False,  # type: bool
     session=None,  # type: Optional[HttpClient]
+    cache=None,  # type: Optional[ParsedLinesCache]
+    prefetch=False,  # type: bool
 ):
     # type: (...) -> Iterator[ParsedLine]
+    """Parse a requirements file or URL, yielding parsed lines.
+
+    With ``prefetch``, nested requirements files are fetched and parsed
+    concurrently, as soon as the file including them is parsed. Lines
+    are still yielded in the same order.
+    """
+    parsed_lines = _parse_file(filename, constraints, strict, session, cache)
+    include_stack = (_file_key(filename),)
+    if prefetch and recurse:
+        return _parse_prefetch(
+            list(parsed_lines),
+            reqs_only=reqs_only,
+            strict=strict,
+            session=session,
+            cache=cache,
+            include_stack=include_stack,
+        )
     return _parse(
-        _get_file_lines(filename, session),
-        filename,
+        parsed_lines,
         recurse=recurse,
         reqs_only=reqs_only,
-        strict=strict,
-        constraints=constraints,
-        session=session,
+        nested_files_parser=_NestedFilesParser(strict, session, cache),
+        include_stack=include_stack,
     )
 
 
@@ -172,45 +273,221 @@ def parse_lines(
     strict=False,  # type: bool
     constraints=False,  # type: bool
     session=None,  # type: Optional[HttpClient]
+    cache=None,  # type: Optional[ParsedLinesCache]
 ):
     # type: (...) -> Iterator[ParsedLine]
     return _parse(
-        lines,
-        filename,
+        _parse_lines(lines, filename, constraints, strict),
         recurse=recurse,
         reqs_only=reqs_only,
-        strict=strict,
-        constraints=constraints,
-        session=session,
+        nested_files_parser=_NestedFilesParser(strict, session, cache),
+        include_stack=(_file_key(filename),),
     )
 
 
-def _parse(
-    lines,  # type: Iterable[str]
+def _parse_file(
     filename,  # type: str
-    recurse=True,  # type: bool
-    reqs_only=True,  # type: bool
-    strict=False,  # type: bool
-    constraints=False,  # type: bool
-    session=None,  # type: Optional[HttpClient]
+    constraints,  # type: bool
+    strict,  # type: bool
+    session,  # type: Optional[HttpClient]
+    cache,  # type: Optional[ParsedLinesCache]
+):
+    # type: (...) -> Iterator[ParsedLine]
+    """Parse the lines of a given file or URL, without recursing.
+
+    Lines of local files are looked up in, and stored into, the cache.
+    """
+    if cache is None or _get_url_scheme(filename) in ["http", "https", "file"]:
+        return _parse_lines(
+            _get_file_lines(filename, session), filename, constraints, strict
+        )
+    parsed_lines = cache.get(filename, constraints, strict)
+    if parsed_lines is None:
+        parsed_lines = list(
+            _parse_lines(_iter_file_lines(filename), filename, constraints, strict)
+        )
+        cache.set(filename, constraints, strict, parsed_lines)
+    return iter(parsed_lines)
+
+
+class _NestedFilesParser(object):
+    """Parse each nested requirements file only once per parse session.
+
+    Files are streamed the first time they are included. Files that are
+    included again (e.g. a base.txt included by several other included
+    files) are parsed once more and their parsed lines are kept, to be
+    replayed the next times. So large files included once are never held
+    in memory.
+    """
+
+    def __init__(
+        self,
+        strict,  # type: bool
+        session,  # type: Optional[HttpClient]
+        cache,  # type: Optional[ParsedLinesCache]
+    ):
+        # type: (...) -> None
+        self.strict = strict
+        self.session = session
+        self.cache = cache
+        self._included_files = set()  # type: Set[Tuple[str, bool]]
+        self._parsed_files = {}  # type: Dict[Tuple[str, bool], List[ParsedLine]]
+
+    def _parse_file(self, filename, constraints):
+        # type: (str, bool) -> Iterator[ParsedLine]
+        return _parse_file(filename, constraints, self.strict, self.session, self.cache)
+
+    def parse(self, filename, constraints):
+        # type: (str, bool) -> Iterable[ParsedLine]
+        key = (_file_key(filename), constraints)
+        if key in self._parsed_files:
+            return self._parsed_files[key]
+        if key not in self._included_files:
+            self._included_files.add(key)
+            return self._parse_file(filename, constraints)
+        parsed_lines = list(self._parse_file(filename, constraints))
+        self._parsed_files[key] = parsed_lines
+        return parsed_lines
+
+
+class _PrefetchingNestedFilesParser(_NestedFilesParser):
+    """Download remote nested requirements files concurrently, as soon as they
+    are known.
+
+    Local files are streamed when they are reached, as in the base class.
+    Parsed lines of remote files are kept until all the includes of the file
+    seen so far have been reached.
+    """
+
+    def __init__(
+        self,
+        executor,  # type: ThreadPoolExecutor
+        strict,  # type: bool
+        session,  # type: Optional[HttpClient]
+        cache,  # type: Optional[ParsedLinesCache]
+    ):
+        # type: (...) -> None
+        super().__init__(strict, session, cache)
+        self._executor = executor
+        self._futures = {}  # type: Dict[Tuple[str, bool], Future[List[ParsedLine]]]
+        self._pending_includes = {}  # type: Dict[Tuple[str, bool], int]
+        self._futures_lock = threading.Lock()
+
+    def _fetch(self, filename, constraints):
+        # type: (str, bool) -> Future[List[ParsedLine]]
+        """Start parsing a remote file, and count one more include of it.
+
+        Must be called with the futures lock held.
+        """
+        key = (filename, constraints)
+        if key not in self._futures:
+            self._futures[key] = self._executor.submit(
+                self._fetch_and_parse, filename, constraints
+            )
+            self._pending_includes[key] = 0
+        self._pending_includes[key] += 1
+        return self._futures[key]
+
+    def _fetch_and_parse(self, filename, constraints):
+        # type: (str, bool) -> List[ParsedLine]
+        parsed_lines = list(self._parse_file(filename, constraints))
+        self.prefetch(parsed_lines)
+        return parsed_lines
+
+    def prefetch(self, parsed_lines):
+        # type: (Iterable[ParsedLine]) -> None
+        """Start parsing the remote files included in parsed_lines."""
+        for line in parsed_lines:
+            if isinstance(line, NestedRequirementsLine):
+                nested_filename = _file_or_url_join(line.requirements, line.filename)
+                if _SCHEME_RE.search(nested_filename):
+                    with self._futures_lock:
+                        self._fetch(nested_filename, line.is_constraint)
+
+    def parse(self, filename, constraints):
+        # type: (str, bool) -> Iterable[ParsedLine]
+        if not _SCHEME_RE.search(filename):
+            return super().parse(filename, constraints)
+        key = (filename, constraints)
+        with self._futures_lock:
+            if key not in self._futures:
+                # included by a file that was not prefetched
+                self._fetch(filename, constraints)
+            future = self._futures[key]
+            self._pending_includes[key] -= 1
+            if not self._pending_includes[key]:
+                # a later include, not known yet, will download it again
+                del self._futures[key]
+                del self._pending_includes[key]
+        return future.result()
+
+
+def _parse(
+    parsed_lines,  # type: Iterable[ParsedLine]
+    recurse,  # type: bool
+    reqs_only,  # type: bool
+    nested_files_parser,  # type: _NestedFilesParser
+    include_stack,  # type: Tuple[str, ...]
 ):
     # type: (...) -> Iterator[ParsedLine]
-    """Parse a given file or URL, yielding parsed lines."""
-    for line in _parse_lines(lines, filename, constraints, strict):
+    """Yield parsed lines, recursing into nested requirements files."""
+    for line in parsed_lines:
         if not reqs_only or isinstance(line, RequirementLine):
             yield line
         if isinstance(line, NestedRequirementsLine) and recurse:
-            for inner_line in parse(
-                filename=_file_or_url_join(line.requirements, line.filename),
+            nested_filename = _file_or_url_join(line.requirements, line.filename)
+            nested_key = _file_key(nested_filename)
+            if nested_key in include_stack:
+                raise RequirementsFileParserError(
+                    "Circular inclusion of {nested} at {filename}:{lineno}".format(
+                        nested=nested_filename,
+                        filename=line.filename,
+                        lineno=line.lineno,
+                    )
+                )
+            for inner_line in _parse(
+                nested_files_parser.parse(nested_filename, line.is_constraint),
                 recurse=recurse,
                 reqs_only=reqs_only,
-                strict=strict,
-                constraints=line.is_constraint,
-                session=session,
+                nested_files_parser=nested_files_parser,
+                include_stack=include_stack + (nested_key,),
             ):
                 yield inner_line
 
 
+def _parse_prefetch(
+    parsed_lines,  # type: List[ParsedLine]
+    reqs_only,  # type: bool
+    strict,  # type: bool
+    session,  # type: Optional[HttpClient]
+    cache,  # type: Optional[ParsedLinesCache]
+    include_stack,  # type: Tuple[str, ...]
+):
+    # type: (...) -> Iterator[ParsedLine]
+    """Yield parsed lines, recursing into prefetched nested requirements files."""
+    with ThreadPoolExecutor() as executor:
+        nested_files_parser = _PrefetchingNestedFilesParser(
+            executor, strict, session, cache
+        )
+        nested_files_parser.prefetch(parsed_lines)
+        for line in _parse(
+            parsed_lines,
+            recurse=True,
+            reqs_only=reqs_only,
+            nested_files_parser=nested_files_parser,
+            include_stack=include_stack,
+        ):
+            yield line
+
+
+def _file_key(filename):
+    # type: (str) -> str
+    """A key identifying a requirements file, whatever the path spelling."""
+    if _SCHEME_RE.search(filename):
+        return filename
+    return os.path.normcase(os.path.abspath(filename))
+
+
 def _file_or_url_join(filename: str, base_filename: Optional[str]) -> str:
     if not base_filename:
         return filename
@@ -304,6 +581,16 @@ _options_parser.add_argument("-c", "--constraints", action="append")
 
 
 def _parse_line(line, filename, lineno, strict):
+    # type: (Text, str, int, bool) -> Tuple[str, ParsedOptions, List[str]]
+    if not _OPTION_TOKEN_RE.search(line):
+        # Fast path for the vast majority of lines (name==version,
+        # name @ url, ...) which have no options: this is what
+        # _break_args_options and the options parser would return.
+        return line.strip(), ParsedOptions(), []
+    return _parse_line_with_options(line, filename, lineno, strict)
+
+
+def _parse_line_with_options(line, filename, lineno, strict):
     # type: (Text, str, int, bool) -> Tuple[str, ParsedOptions, List[str]]
     args_str, options_str = _break_args_options(line)
     try:
@@ -346,58 +633,19 @@ def _break_args_options(line):
     return " ".join(args), " ".join(options)
 
 
-def _join_lines(lines_enum):
-    # type: (Iterator[Tuple[int, Text]]) -> ReqFileLines
-    """Joins a line ending in '\' with the previous line (except when following
-    comments).
-
-    The joined line takes on the index of the first line.
-    """
-    primary_line_number = None
-    new_lines = []  # type: List[Text]
-    raw_lines = []  # type: List[Text]
-    for line_number, raw_line in lines_enum:
-        raw_line = raw_line.rstrip("\n")  # in case lines comes from open()
-        if not raw_line.endswith("\\") or _COMMENT_RE.match(raw_line):
-            if _COMMENT_RE.match(raw_line):
-                # this ensures comments are always matched later
-                line = " " + raw_line
-            else:
-                line = raw_line
-            if new_lines:
-                new_lines.append(line)
-                raw_lines.append(raw_line)
-                assert primary_line_number is not None
-                yield primary_line_number, "".join(new_lines), "\n".join(raw_lines)
-                new_lines = []
-                raw_lines = []
-            else:
-                yield line_number, line, raw_line
-        else:
-            if not new_lines:
-                primary_line_number = line_number
-            new_lines.append(raw_line.strip("\\"))
-            raw_lines.append(raw_line)
-
-    # last line contains \
-    if new_lines:
-        assert primary_line_number is not None
-        yield primary_line_number, "".join(new_lines), "\n".join(raw_lines)
-
-    # TODO (from pip codebase): handle space after '\'.
-
-
-def _remove_comments(lines_enum):
-    # type: (ReqFileLines) -> ReqFileLines
-    """Strips comments and filter empty lines."""
-    for line_number, line, raw_line in lines_enum:
+def _clean_line(line):
+    # type: (Text) -> Text
+    """Strip comments and whitespace, and expand environment variables."""
+    if "#" in line:
         line = _COMMENT_RE.sub("", line)
-        line = line.strip()
-        yield line_number, line, raw_line
+    line = line.strip()
+    if "${" in line:
+        line = _expand_env_variables(line)
+    return line
 
 
-def _expand_env_variables(lines_enum):
-    # type: (ReqFileLines) -> ReqFileLines
+def _expand_env_variables(line):
+    # type: (Text) -> Text
     """Replace all environment variables that can be retrieved via `os.getenv`.
 
     The only allowed format for environment variables defined in the
@@ -413,15 +661,14 @@ def _expand_env_variables(lines_enum):
     <http://pubs.opengroup.org/onlinepubs/9699919799/>`_ and are limited
     to uppercase letter, digits and the `_` (underscore).
     """
-    for line_number, line, raw_line in lines_enum:
-        for env_var, var_name in _ENV_VAR_RE.findall(line):
-            value = os.getenv(var_name)
-            if value is None:
-                continue
+    for env_var, var_name in _ENV_VAR_RE.findall(line):
+        value = os.getenv(var_name)
+        if value is None:
+            continue
 
-            line = line.replace(env_var, value)
+        line = line.replace(env_var, value)
 
-        yield line_number, line, raw_line
+    return line
 
 
 _BOMS = [
@@ -437,24 +684,58 @@ _BOMS = [
 _ENCODING_RE = re.compile(rb"coding[:=]\s*([-\w.]+)")
 
 
-def _auto_decode(data):
-    # type: (bytes) -> Text
-    """Check a bytes string for a BOM to correctly detect the encoding.
+def _detect_encoding(data):
+    # type: (bytes) -> Tuple[Text, int]
+    """Check the beginning of a bytes string for a BOM or a PEP263 declaration.
 
-    Fallback to locale.getpreferredencoding(False) like open() on
-    Python3
+    Return the encoding and the length of the BOM. Fallback to
+    locale.getpreferredencoding(False) like open() on Python3.
     """
     for bom, encoding in _BOMS:
         if data.startswith(bom):
-            return data[len(bom) :].decode(encoding)
+            return encoding, len(bom)
     # Lets check the first two lines as in PEP263
-    for line in data.split(b"\n")[:2]:
+    for line in data.split(b"\n", 2)[:2]:
         if line[0:1] == b"#" and _ENCODING_RE.search(line):
             result = _ENCODING_RE.search(line)
             assert result is not None
-            encoding = result.groups()[0].decode("ascii")
-            return data.decode(encoding)
-    return data.decode(locale.getpreferredencoding(False) or sys.getdefaultencoding())
+            return result.groups()[0].decode("ascii"), 0
+    return locale.getpreferredencoding(False) or sys.getdefaultencoding(), 0
+
+
+def _auto_decode(data):
+    # type: (bytes) -> Text
+    """Check a bytes string for a BOM to correctly detect the encoding."""
+    encoding, bom_len = _detect_encoding(data)
+    return data[bom_len:].decode(encoding)
+
+
+def _iter_file_lines(filename):
+    # type: (str) -> Iterator[Text]
+    """Yield the lines of a local file, decoding it incrementally.
+
+    This is equivalent to _auto_decode(data).splitlines(), without
+    holding the whole file content in memory.
+    """
+    try:
+        with open(filename, "rb") as f:
+            # the BOM or the PEP263 declaration are in the first two lines
+            encoding, bom_len = _detect_encoding(f.readline() + f.readline())
+            if encoding in ("utf-16", "utf-32"):
+                # these incremental decoders need the BOM to detect endianness
+                f.seek(0)
+            else:
+                f.seek(bom_len)
+            with io.TextIOWrapper(f, encoding=encoding, newline=None) as text:
+                for line in text:
+                    # splitlines() also splits on other line boundaries
+                    # than universal newlines, such as form feeds
+                    for subline in line.splitlines():
+                        yield subline
+    except (OSError, UnicodeError, LookupError) as exc:
+        raise RequirementsFileParserError(
+            "Could not open requirements file: {}".format(exc)
+        )
 
 
 def _get_url_scheme(url):
@@ -466,6 +747,17 @@ def _get_url_scheme(url):
 
 def _get_file_lines(url, session):
     # type: (str, Optional[HttpClient]) -> Iterable[str]
+    """Gets the lines of a file; see _get_file_content.
+
+    Local files are read lazily, line by line.
+    """
+    if _get_url_scheme(url) in ["http", "https", "file"]:
+        return _get_file_content(url, session).splitlines()
+    return _iter_file_lines(url)
+
+
+def _get_file_content(url, session):
+    # type: (str, Optional[HttpClient]) -> Text
     """Gets the content of a file as unicode; it may be a filename, file: URL, or
     http: URL. Respects # -*- coding: declarations on the retrieved files.
 
@@ -503,4 +795,4 @@ def _get_file_lines(url, session):
             raise RequirementsFileParserError(
                 "Could not open requirements file: {}".format(exc)
             )
-    return content.splitlines()
+    return content
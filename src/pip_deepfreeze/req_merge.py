@@ -1,55 +1,156 @@
+import contextlib
+import itertools
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Iterable, Iterator, Optional
+from typing import Container, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
-import httpx
 from packaging.utils import canonicalize_name
 
-from .compat import shlex_join
-from .req_file_parser import OptionsLine, RequirementLine, parse
+from .compat import NormalizedName, shlex_join
+from .http_session import HttpSession
+from .req_file_parser import (
+    HttpClient,
+    NestedRequirementsLine,
+    OptionsLine,
+    ParsedLinesCache,
+    RequirementLine,
+    _file_or_url_join,
+    parse,
+)
 from .req_parser import get_req_name
 from .utils import log_error
 
 
+def _parse_frozen_reqs(
+    frozen_filename: Path, cache: Optional[ParsedLinesCache]
+) -> List[RequirementLine]:
+    if not frozen_filename.is_file():
+        return []
+    frozen_reqs = []
+    for frozen_req in parse(
+        str(frozen_filename),
+        recurse=True,
+        reqs_only=True,
+        strict=True,
+        cache=cache,
+    ):
+        assert isinstance(frozen_req, RequirementLine)
+        frozen_reqs.append(frozen_req)
+    return frozen_reqs
+
+
+def _parse_frozen_reqs_files(
+    frozen_filenames: Sequence[Path], cache: Optional[ParsedLinesCache], jobs: int
+) -> Iterator[List[RequirementLine]]:
+    """Parse frozen requirements files, in ``jobs`` parallel processes.
+
+    Results are in the same order as ``frozen_filenames``.
+    """
+    if jobs > 1 and len(frozen_filenames) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            yield from executor.map(
+                _parse_frozen_reqs, frozen_filenames, itertools.repeat(cache)
+            )
+    else:
+        for frozen_filename in frozen_filenames:
+            yield _parse_frozen_reqs(frozen_filename, cache)
+
+
+class MergedReqs:
+    """The result of merging frozen requirements and constraints."""
+
+    def __init__(self) -> None:
+        # pip options and requirements to use as pip constraints
+        self.lines = []  # type: List[str]
+        # for each line, the distribution name if it is a constraint that
+        # is not a frozen requirement, else None
+        self.constraint_names = []  # type: List[Optional[NormalizedName]]
+        # pip options lines of the constraints file and its included files
+        self.options_lines = []  # type: List[OptionsLine]
+        # the constraints file and the files it includes
+        self.included_files = set()  # type: Set[str]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.lines)
+
+    def add_line(self, line: str, constraint_name: Optional[NormalizedName]) -> None:
+        self.lines.append(line)
+        self.constraint_names.append(constraint_name)
+
+    def pruned(
+        self, names: Container[NormalizedName]
+    ) -> Tuple[List[str], Set[NormalizedName]]:
+        """Remove constraints on distributions that are not in ``names``.
+
+        Options and frozen requirements are always kept. Return the
+        remaining lines, and the names of the removed constraints.
+        """
+        lines = []
+        pruned_names = set()
+        for line, constraint_name in zip(self.lines, self.constraint_names):
+            if constraint_name is None or constraint_name in names:
+                lines.append(line)
+            else:
+                pruned_names.add(constraint_name)
+        return lines, pruned_names
+
+
 def prepare_frozen_reqs_for_upgrade(
     frozen_filenames: Iterable[Path],
     in_filename: Path,
     upgrade_all: bool = False,
     to_upgrade: Optional[Iterable[str]] = None,
-) -> Iterator[str]:
+    cache: Optional[ParsedLinesCache] = None,
+    session: Optional[HttpClient] = None,
+    jobs: int = 1,
+) -> MergedReqs:
     """Merge frozen requirements and constraints.
 
     pip options are taken from the constraints file. All frozen
     requirements are preserved, unless an upgrade is explicitly
     requested via ``upgrade_all`` or ``to_upgrade``. Other constraints
-    not in frozen requirements are added.
+    not in frozen requirements are added. Frozen requirements files
+    are parsed in ``jobs`` parallel processes. Remote requirements files
+    are downloaded with ``session``, or with a new HttpSession if None.
     """
+    merged_reqs = MergedReqs()
     to_upgrade_set = {canonicalize_name(r) for r in to_upgrade or []}
     in_reqs = []
     frozen_reqs = set()
     # 1. emit options from in_filename, collect in_reqs
     if in_filename.is_file():
-        for in_req in parse(
-            str(in_filename),
-            recurse=True,
-            reqs_only=False,
-            strict=True,
-            session=httpx.Client(),
-        ):
-            if isinstance(in_req, OptionsLine):
-                yield shlex_join(in_req.options)
-            elif isinstance(in_req, RequirementLine):
-                req_name = get_req_name(in_req.requirement)
-                if not req_name:
-                    log_error(f"Ignoring unnamed constraint {in_req.raw_line!r}.")
-                    continue
-                in_reqs.append((req_name, in_req.requirement))
-    # 2. emit frozen_reqs unless upgrade_all or it is in to_upgrade
-    for frozen_filename in frozen_filenames:
-        if frozen_filename.is_file() and not upgrade_all:
-            for frozen_req in parse(
-                str(frozen_filename), recurse=True, reqs_only=True, strict=True
+        merged_reqs.included_files.add(str(in_filename))
+        with contextlib.ExitStack() as stack:
+            if session is None:
+                session = stack.enter_context(HttpSession())
+            for in_req in parse(
+                str(in_filename),
+                recurse=True,
+                reqs_only=False,
+                strict=True,
+                session=session,
+                cache=cache,
+                prefetch=True,
             ):
-                assert isinstance(frozen_req, RequirementLine)
+                if isinstance(in_req, NestedRequirementsLine):
+                    merged_reqs.included_files.add(
+                        _file_or_url_join(in_req.requirements, in_req.filename)
+                    )
+                elif isinstance(in_req, OptionsLine):
+                    merged_reqs.options_lines.append(in_req)
+                    merged_reqs.add_line(shlex_join(in_req.options), None)
+                elif isinstance(in_req, RequirementLine):
+                    req_name = get_req_name(in_req.requirement)
+                    if not req_name:
+                        log_error(f"Ignoring unnamed constraint {in_req.raw_line!r}.")
+                        continue
+                    in_reqs.append((req_name, in_req.requirement))
+    # 2. emit frozen_reqs unless upgrade_all or it is in to_upgrade
+    if not upgrade_all:
+        for frozen_reqs_lines in _parse_frozen_reqs_files(
+            list(frozen_filenames), cache, jobs
+        ):
+            for frozen_req in frozen_reqs_lines:
                 req_name = get_req_name(frozen_req.requirement)
                 if not req_name:
                     log_error(
@@ -59,8 +160,9 @@ def prepare_frozen_reqs_for_upgrade(
                 if req_name in to_upgrade_set:
                     continue
                 frozen_reqs.add(req_name)
-                yield frozen_req.requirement
+                merged_reqs.add_line(frozen_req.requirement, None)
     # 3. emit in_reqs that have not been emitted as frozen reqs
     for req_name, in_req_str in in_reqs:
         if req_name not in frozen_reqs:
-            yield in_req_str
+            merged_reqs.add_line(in_req_str, req_name)
+    return merged_reqs
@@ -1,8 +1,12 @@
+import functools
 import re
-from typing import Iterable, List, Optional
+from typing import FrozenSet, Iterable, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
 
 from packaging.requirements import InvalidRequirement, Requirement
+from packaging.specifiers import SpecifierSet
 from packaging.utils import canonicalize_name
+from packaging.version import InvalidVersion, Version
 
 from .compat import NormalizedName
 
@@ -14,6 +18,23 @@ _egg_name_regex = re.compile(
 )
 
 
+# Matches the most common requirement forms, as output by pip freeze:
+# name, name==version (with a PEP 440 version) and name @ url (with an url
+# that has a netloc), for which the name is the same as what the full
+# Requirement parser would give.
+_simple_req_regex = re.compile(
+    r"(?P<name>[A-Z0-9][A-Z0-9._-]*[A-Z0-9]|[A-Z0-9])"
+    r"(?:"
+    r"==(?:[0-9]+!)?[0-9]+(?:\.[0-9]+)*"
+    r"(?:(?:a|b|rc)[0-9]+)?(?:\.post[0-9]+)?(?:\.dev[0-9]+)?"
+    r"(?:\+[a-z0-9]+(?:\.[a-z0-9]+)*)?"
+    r"|"
+    r" @ [a-z][a-z0-9+.-]*://[^\s/;@]+(?:/[^\s;]*)?"
+    r")?",
+    re.I,
+)
+
+
 def _get_egg_name(requirement: str) -> Optional[str]:
     mo = _egg_name_regex.search(requirement)
     if not mo:
@@ -21,7 +42,15 @@ def _get_egg_name(requirement: str) -> Optional[str]:
     return mo.group(1)
 
 
+@functools.lru_cache(maxsize=8192)
 def get_req_name(requirement: str) -> Optional[NormalizedName]:
+    mo = _simple_req_regex.fullmatch(requirement)
+    if mo:
+        return canonicalize_name(mo.group("name"))
+    return _get_req_name(requirement)
+
+
+def _get_req_name(requirement: str) -> Optional[NormalizedName]:
     name: Optional[str] = None
     try:
         name = Requirement(requirement).name
@@ -32,6 +61,85 @@ def get_req_name(requirement: str) -> Optional[NormalizedName]:
     return canonicalize_name(name)
 
 
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def _normalize_url(url: str) -> Tuple[str, ...]:
+    """Normalize an url for comparison.
+
+    Scheme and host are case insensitive, default ports and
+    percent-encoding are ignored, and so is the egg fragment, since
+    requirement names are compared separately.
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc
+    userinfo, sep, hostport = netloc.rpartition("@")
+    hostport = hostport.lower()
+    port = _DEFAULT_PORTS.get(scheme.rpartition("+")[2])
+    if port and hostport.endswith(f":{port}"):
+        hostport = hostport[: -len(f":{port}")]
+    fragment = "&".join(
+        sorted(
+            param
+            for param in parts.fragment.split("&")
+            if param and not param.startswith("egg=")
+        )
+    )
+    return (
+        scheme,
+        userinfo + sep + hostport,
+        unquote(parts.path),
+        parts.query,
+        fragment,
+    )
+
+
+def _normalize_specifiers(specifier: SpecifierSet) -> FrozenSet[Tuple[str, object]]:
+    normalized = set()
+    for spec in specifier:
+        version: object
+        try:
+            version = Version(spec.version)
+        except InvalidVersion:
+            # wildcards, or legacy versions with ===
+            version = spec.version
+        normalized.add((spec.operator, version))
+    return frozenset(normalized)
+
+
+def requirements_equivalent(requirement1: str, requirement2: str) -> bool:
+    """Compare requirements semantically.
+
+    Names are compared in canonical form, versions as Version objects,
+    so 1.0 is equivalent to 1.0.0, and direct urls after normalization.
+    Requirements that cannot be parsed, such as editables, are compared
+    as strings.
+    """
+    if requirement1 == requirement2:
+        return True
+    try:
+        req1 = Requirement(requirement1)
+        req2 = Requirement(requirement2)
+    except InvalidRequirement:
+        return requirement1.strip() == requirement2.strip()
+    if canonicalize_name(req1.name) != canonicalize_name(req2.name):
+        return False
+    if {canonicalize_name(e) for e in req1.extras} != {
+        canonicalize_name(e) for e in req2.extras
+    }:
+        return False
+    if str(req1.marker) != str(req2.marker):
+        return False
+    if req1.url or req2.url:
+        if not req1.url or not req2.url:
+            return False
+        return _normalize_url(req1.url) == _normalize_url(req2.url)
+    return _normalize_specifiers(req1.specifier) == _normalize_specifiers(
+        req2.specifier
+    )
+
+
 def get_req_names(requirements: Iterable[str]) -> List[NormalizedName]:
     req_names = []
     for requirement in requirements:
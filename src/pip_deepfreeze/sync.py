@@ -1,21 +1,31 @@
+import contextlib
 import tempfile
 from pathlib import Path
-from typing import Iterator, List, Optional, Sequence
+from typing import Iterator, List, Optional, Sequence, Set
 
-import httpx
 import typer
 
 from .compat import NormalizedName
-from .pip import pip_freeze_dependencies_by_extra, pip_uninstall, pip_upgrade_project
+from .http_cache import CachingHttpClient
+from .http_session import HttpSession
+from .list_installed_depends import list_installed_depends
+from .pip import (
+    pip_freeze_dependencies_by_extra,
+    pip_list,
+    pip_uninstall,
+    pip_upgrade_project,
+)
 from .project_name import get_project_name
-from .req_file_parser import OptionsLine, parse as parse_req_file
+from .req_file_cache import ParsedLinesDiskCache
+from .req_file_parser import HttpClient
 from .req_merge import prepare_frozen_reqs_for_upgrade
 from .req_parser import get_req_names
 from .utils import (
+    FilesTransaction,
     log_debug,
     log_info,
     make_project_name_with_extras,
-    open_with_rollback,
+    trace_memory,
 )
 
 
@@ -34,18 +44,22 @@ def _make_requirements_paths(
         yield _make_requirements_path(project_root, extra)
 
 
-def sync(
+def _installed_project_depends(
+    python: str, project_name: NormalizedName, extras: Sequence[NormalizedName]
+) -> Optional[Set[NormalizedName]]:
+    """Installed dependencies of the project, or None if it is not installed."""
+    installed_dists = pip_list(python)
+    if project_name not in installed_dists:
+        return None
+    return list_installed_depends(installed_dists, project_name, extras)
+
+
+def _upgrade_project(
     python: str,
-    upgrade_all: bool,
-    to_upgrade: List[str],
-    extras: List[NormalizedName],
-    uninstall_unneeded: Optional[bool],
     project_root: Path,
+    extras: Sequence[NormalizedName],
+    constraint_lines: Sequence[str],
 ) -> None:
-    project_name = get_project_name(python, project_root)
-    project_name_with_extras = make_project_name_with_extras(project_name, extras)
-    requirements_in = project_root / "requirements.txt.in"
-    # upgrade project and its dependencies, if needed
     with tempfile.NamedTemporaryFile(
         dir=project_root,
         prefix="requirements.",
@@ -54,12 +68,7 @@ def sync(
         encoding="utf-8",
         delete=False,
     ) as constraints:
-        for req_line in prepare_frozen_reqs_for_upgrade(
-            _make_requirements_paths(project_root, extras),
-            requirements_in,
-            upgrade_all,
-            to_upgrade,
-        ):
+        for req_line in constraint_lines:
             print(req_line, file=constraints)
     constraints_path = Path(constraints.name)
     try:
@@ -71,29 +80,93 @@ def sync(
         )
     finally:
         constraints_path.unlink()
+
+
+def sync(
+    python: str,
+    upgrade_all: bool,
+    to_upgrade: List[str],
+    extras: List[NormalizedName],
+    uninstall_unneeded: Optional[bool],
+    project_root: Path,
+    cache_dir: Optional[Path] = None,
+    http_cache_max_age: float = 0,
+    offline: bool = False,
+    http_session: Optional[HttpSession] = None,
+    parse_jobs: int = 1,
+    prune_constraints: bool = False,
+) -> None:
+    project_name = get_project_name(python, project_root)
+    project_name_with_extras = make_project_name_with_extras(project_name, extras)
+    requirements_in = project_root / "requirements.txt.in"
+    cache = ParsedLinesDiskCache(cache_dir / "req-files") if cache_dir else None
+    # upgrade project and its dependencies, if needed
+    with contextlib.ExitStack() as stack:
+        if http_session is None:
+            http_session = stack.enter_context(HttpSession())
+        session = http_session  # type: HttpClient
+        if cache_dir:
+            session = CachingHttpClient(
+                http_session,
+                cache_dir / "http",
+                max_age=http_cache_max_age,
+                offline=offline,
+            )
+        with trace_memory("requirements parsing"):
+            merged_reqs = prepare_frozen_reqs_for_upgrade(
+                _make_requirements_paths(project_root, extras),
+                requirements_in,
+                upgrade_all,
+                to_upgrade,
+                cache=cache,
+                session=session,
+                jobs=parse_jobs,
+            )
+    constraint_lines = merged_reqs.lines
+    pruned_names = set()  # type: Set[NormalizedName]
+    if prune_constraints:
+        installed_depends = _installed_project_depends(python, project_name, extras)
+        if installed_depends is None:
+            log_debug(
+                f"{project_name} is not installed, "
+                f"not pruning constraints of {requirements_in}."
+            )
+        else:
+            constraint_lines, pruned_names = merged_reqs.pruned(installed_depends)
+            log_debug(
+                f"Pruned {len(pruned_names)} constraints "
+                f"that do not apply to {project_name_with_extras}."
+            )
+    _upgrade_project(python, project_root, extras, constraint_lines)
+    if pruned_names:
+        # the upgrade may have brought new dependencies, whose constraints
+        # were pruned: install again with all constraints in that case
+        installed_depends = _installed_project_depends(python, project_name, extras)
+        missed_names = pruned_names & (installed_depends or set())
+        if missed_names:
+            missed_names_str = ",".join(sorted(missed_names))
+            log_info(
+                f"Installing again with all constraints, "
+                f"for new dependencies {missed_names_str}"
+            )
+            _upgrade_project(python, project_root, extras, merged_reqs.lines)
     # freeze dependencies
     frozen_reqs_by_extra, unneeded_reqs = pip_freeze_dependencies_by_extra(
         python, project_root, extras
     )
-    for extra, frozen_reqs in frozen_reqs_by_extra.items():
-        requirements_frozen_path = _make_requirements_path(project_root, extra)
-        with open_with_rollback(requirements_frozen_path) as f:
-            print("# frozen requirements generated by pip-deepfreeze", file=f)
-            # output pip options in main requirements only
-            if not extra and requirements_in.exists():
-                # XXX can we avoid this second parse of requirements.txt.in?
-                for parsed_req_line in parse_req_file(
-                    str(requirements_in),
-                    reqs_only=False,
-                    recurse=True,
-                    strict=True,
-                    session=httpx.Client(),
-                ):
-                    if isinstance(parsed_req_line, OptionsLine):
-                        print(parsed_req_line.raw_line, file=f)
-            # output frozen dependencies of project
-            for req_line in frozen_reqs:
-                print(req_line, file=f)
+    # write all requirements files, then publish them together
+    with FilesTransaction() as transaction:
+        for extra, frozen_reqs in frozen_reqs_by_extra.items():
+            requirements_frozen_path = _make_requirements_path(project_root, extra)
+            with transaction.open(requirements_frozen_path) as f:
+                print("# frozen requirements generated by pip-deepfreeze", file=f)
+                # output pip options in main requirements only
+                if not extra:
+                    for options_line in merged_reqs.options_lines:
+                        print(options_line.raw_line, file=f)
+                # output frozen dependencies of project
+                for req_line in frozen_reqs:
+                    print(req_line, file=f)
     # uninstall unneeded dependencies, if asked to do so
     if unneeded_reqs:
         unneeded_req_names = get_req_names(unneeded_reqs)
@@ -1,63 +1,54 @@
+import functools
+import json
+from collections import deque
+from enum import Enum
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
 
 import typer
-from packaging.requirements import Requirement
+from packaging.requirements import InvalidRequirement, Requirement
 from packaging.utils import canonicalize_name
 
 from .compat import NormalizedName
+from .dependency_graph import DependencyGraph
 from .installed_dist import InstalledDistribution
 from .pip import pip_list
 from .project_name import get_project_name
-from .utils import make_project_name_with_extras
+from .utils import log_error, make_project_name_with_extras, trace_memory
 
-NodeKey = Tuple[NormalizedName, Tuple[NormalizedName, ...]]
+NodeKey = Tuple[Optional[int], Tuple[NormalizedName, ...]]
+
+
+class TreeFormat(str, Enum):
+    text = "text"
+    json = "json"
+    dot = "dot"
 
 
 class Node:
-    def __init__(self, req: Requirement, dist: Optional[InstalledDistribution]):
+    def __init__(
+        self,
+        req: str,
+        name: NormalizedName,
+        dist: Optional[InstalledDistribution],
+        expand: Optional[Callable[[], List["Node"]]] = None,
+    ):
         self.req = req
+        self.name = name
         self.dist = dist
-        self.children = []  # type: List[Node]
-
-    @staticmethod
-    def key(req: Requirement) -> NodeKey:
-        return (
-            canonicalize_name(req.name),
-            tuple(sorted(canonicalize_name(e) for e in req.extras)),
-        )
-
-    def print(self) -> None:
-        seen = set()  # type: Set[Node]
-
-        def _print(indent: List[str], node: Node) -> None:
-            # inspired by https://stackoverflow.com/a/59109706
-            SPACE = "    "
-            BRANCH = "│   "
-            TEE = "├── "
-            LAST = "└── "
-            typer.echo(f"{''.join(indent)}{node.req}", nl=False)
-            if node in seen:
-                typer.secho(" ⬆", dim=True)
-                return
-            typer.secho(f" ({node.sversion})", dim=True)
-            seen.add(node)
-            if not node.children:
-                return
-            pointers = [TEE] * (len(node.children) - 1) + [LAST]
-            for pointer, child in zip(
-                pointers, sorted(node.children, key=lambda n: str(n.req))
-            ):
-                if indent:
-                    if indent[-1] == TEE:
-                        _print(indent[:-1] + [BRANCH, pointer], child)
-                    else:
-                        assert indent[-1] == LAST
-                        _print(indent[:-1] + [SPACE, pointer], child)
-                else:
-                    _print([pointer], child)
-
-        _print([], self)
+        self._expand = expand
+        self._children = None  # type: Optional[List[Node]]
+
+    @property
+    def children(self) -> List["Node"]:
+        """The child nodes, created on first access."""
+        if self._children is None:
+            self._children = self._expand() if self._expand else []
+            self._expand = None
+        return self._children
+
+    def sorted_children(self) -> List["Node"]:
+        return sorted(self.children, key=lambda n: n.req)
 
     @property
     def sversion(self) -> str:
@@ -70,27 +61,216 @@ class Node:
         return version
 
 
-def tree(python: str, project_root: Path, extras: List[NormalizedName]) -> None:
-    project_name = get_project_name(python, project_root)
+class _BufferedOutput:
+    """Collect output and echo it in large chunks."""
+
+    def __init__(self, chunk_size: int = 64 * 1024) -> None:
+        self.chunk_size = chunk_size
+        self._parts = []  # type: List[str]
+        self._size = 0
+
+    def write(self, s: str) -> None:
+        self._parts.append(s)
+        self._size += len(s)
+        if self._size >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._parts:
+            typer.echo("".join(self._parts), nl=False)
+            self._parts = []
+            self._size = 0
+
+
+def _render_text(root: Node, out: _BufferedOutput, depth: Optional[int]) -> None:
+    # inspired by https://stackoverflow.com/a/59109706
+    SPACE = "    "
+    BRANCH = "│   "
+    TEE = "├── "
+    LAST = "└── "
+    seen = set()  # type: Set[Node]
+
+    def write_node(node: Node, level: int) -> bool:
+        """Write the end of the line of a node, return True to expand it."""
+        if node in seen:
+            out.write(typer.style(" ⬆", dim=True) + "\n")
+            return False
+        out.write(typer.style(f" ({node.sversion})", dim=True) + "\n")
+        if depth is not None and level >= depth:
+            # not expanded, so not seen
+            return False
+        seen.add(node)
+        return bool(node.children)
+
+    out.write(root.req)
+    if not write_node(root, 0):
+        return
+    # stack of (sorted children, level of children, prefix of their lines),
+    # where the prefix is built once per node and shared by all its children;
+    # children are popped in reverse order
+    stack = [(root.sorted_children()[::-1], 1, "")]
+    while stack:
+        children, level, prefix = stack[-1]
+        if not children:
+            stack.pop()
+            continue
+        child = children.pop()
+        is_last = not children
+        out.write(prefix + (LAST if is_last else TEE) + child.req)
+        if write_node(child, level):
+            stack.append(
+                (
+                    child.sorted_children()[::-1],
+                    level + 1,
+                    prefix + (SPACE if is_last else BRANCH),
+                )
+            )
+
+
+def _iter_numbered_nodes(
+    root: Node, depth: Optional[int]
+) -> Iterator[Tuple[Node, int, Optional[List[int]]]]:
+    """Yield nodes once each, breadth first, with their id and their children ids.
+
+    Nodes at the depth limit are not expanded, and are yielded with None
+    instead of their children ids.
+    """
+    ids = {root: 0}  # type: Dict[Node, int]
+    queue = deque([(root, 0)])
+    while queue:
+        node, level = queue.popleft()
+        if depth is not None and level >= depth:
+            yield node, ids[node], None
+            continue
+        children_ids = []
+        for child in node.sorted_children():
+            child_id = ids.get(child)
+            if child_id is None:
+                child_id = ids[child] = len(ids)
+                queue.append((child, level + 1))
+            children_ids.append(child_id)
+        yield node, ids[node], children_ids
+
+
+def _render_json(root: Node, out: _BufferedOutput, depth: Optional[int]) -> None:
+    out.write('{"nodes": [')
+    sep = "\n"
+    for node, node_id, children_ids in _iter_numbered_nodes(root, depth):
+        direct_url = node.dist.direct_url if node.dist else None
+        node_json = {
+            "id": node_id,
+            "requirement": node.req,
+            "name": node.name,
+            "version": node.dist.version if node.dist else None,
+            "direct_url": str(direct_url) if direct_url else None,
+        }  # type: Dict[str, Any]
+        if children_ids is None:
+            # dependencies are unknown, not empty
+            node_json["truncated"] = True
+        else:
+            node_json["dependencies"] = children_ids
+        out.write(sep + json.dumps(node_json))
+        sep = ",\n"
+    out.write("\n]}\n")
+
+
+def _render_dot(root: Node, out: _BufferedOutput, depth: Optional[int]) -> None:
+    out.write("digraph {\n")
+    for node, node_id, children_ids in _iter_numbered_nodes(root, depth):
+        if node.dist:
+            version = node.dist.version
+            if node.dist.direct_url:
+                version += f" @ {node.dist.direct_url}"
+            attrs = f"label={json.dumps(node.req + chr(10) + version)}"
+        else:
+            attrs = f"label={json.dumps(node.req)}, color=red"
+        out.write(f"  n{node_id} [{attrs}];\n")
+        for child_id in children_ids or []:
+            out.write(f"  n{node_id} -> n{child_id};\n")
+    out.write("}\n")
+
+
+_RENDERERS = {
+    TreeFormat.text: _render_text,
+    TreeFormat.json: _render_json,
+    TreeFormat.dot: _render_dot,
+}
+
+
+def tree(
+    python: str,
+    project_root: Path,
+    extras: List[NormalizedName],
+    format: TreeFormat = TreeFormat.text,
+    depth: Optional[int] = None,
+    root: Optional[str] = None,
+) -> None:
+    if root:
+        try:
+            root_req = Requirement(root)
+        except InvalidRequirement as e:
+            log_error(f"Invalid --root {root!r}: {e}")
+            raise typer.Exit(1)
+    else:
+        project_name = get_project_name(python, project_root)
+        root_req = Requirement(make_project_name_with_extras(project_name, extras))
     installed_dists = pip_list(python)
-    nodes = {}  # type: Dict[NodeKey, Node]
-
-    def add(req: Requirement) -> Node:
-        key = Node.key(req)
-        if key in nodes:
-            return nodes[key]
-        dist = installed_dists.get(canonicalize_name(req.name))
-        node = Node(req, dist)
-        nodes[key] = node
-        if not dist:
-            # not installed
-            return node
-        for dep_req in dist.requires:
-            node.children.append(add(dep_req))
-        for extra in req.extras:
-            extra = canonicalize_name(extra)
-            for dep_req in dist.extra_requires.get(extra, []):
-                node.children.append(add(dep_req))
+    with trace_memory("dependency graph construction"):
+        graph = DependencyGraph(installed_dists)
+    root_node = _LazyTree(graph).root(
+        str(root_req), canonicalize_name(root_req.name), _req_extras(root_req)
+    )
+    out = _BufferedOutput()
+    _RENDERERS[format](root_node, out, depth)
+    out.flush()
+
+
+def _req_extras(req: Requirement) -> Tuple[NormalizedName, ...]:
+    return tuple(sorted(canonicalize_name(e) for e in req.extras))
+
+
+class _LazyTree:
+    """Create tree nodes from the dependency graph, as they are rendered.
+
+    There is one node per distribution and set of extras, so the first
+    requirement reaching a node gives its label.
+    """
+
+    def __init__(self, graph: DependencyGraph) -> None:
+        self.graph = graph
+        self.nodes = {}  # type: Dict[NodeKey, Node]
+
+    def root(
+        self, label: str, name: NormalizedName, extras: Tuple[NormalizedName, ...]
+    ) -> Node:
+        dist_id = self.graph.get_id(name)
+        if dist_id is None:
+            return Node(label, name, None)
+        return self._get_node(label, dist_id, extras)
+
+    def _get_node(
+        self, label: str, dist_id: int, extras: Tuple[NormalizedName, ...]
+    ) -> Node:
+        key = (dist_id, extras)
+        node = self.nodes.get(key)
+        if node is None:
+            dist = self.graph.dists[dist_id]
+            node = self.nodes[key] = Node(
+                label,
+                self.graph.names[dist_id],
+                dist,
+                # not installed distributions have no children
+                functools.partial(self._children, dist_id, extras) if dist else None,
+            )
         return node
 
-    add(Requirement(make_project_name_with_extras(project_name, extras))).print()
+    def _children(self, dist_id: int, extras: Tuple[NormalizedName, ...]) -> List[Node]:
+        graph = self.graph
+        return [
+            self._get_node(
+                graph.edge_labels[edge],
+                graph.edge_targets[edge],
+                graph.edge_extras[edge],
+            )
+            for edge in graph.edges(dist_id, graph.extras_mask(dist_id, extras))
+        ]
@@ -1,46 +1,214 @@
 import contextlib
+import hashlib
+import io
+import json
+import os
 import subprocess
+import sys
+import tempfile
+import tracemalloc
 from pathlib import Path
 from subprocess import CalledProcessError
-from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+from types import TracebackType
+from typing import (
+    IO,
+    Any,
+    BinaryIO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Type,
+    Union,
+)
 
 import typer
 
 from .compat import shlex_join
 
 
+class _HashingWriter(io.RawIOBase):
+    """A binary file writer that computes the sha256 of what it writes."""
+
+    def __init__(self, f: BinaryIO) -> None:
+        self._f = f
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b: Any) -> int:
+        n = self._f.write(b)
+        self.sha256.update(memoryview(b)[:n])
+        self.size += n
+        return n
+
+    def fileno(self) -> int:
+        return self._f.fileno()
+
+    def close(self) -> None:
+        if not self.closed:
+            self._f.close()
+        super().close()
+
+
+def _file_sha256(filename: Path, size: int) -> Optional[bytes]:
+    """Return the sha256 of a file if it exists and has the given size."""
+    try:
+        with open(filename, "rb") as f:
+            if os.fstat(f.fileno()).st_size != size:
+                return None
+            sha256 = hashlib.sha256()
+            for chunk in iter(lambda: f.read(64 * 1024), b""):
+                sha256.update(chunk)
+            return sha256.digest()
+    except FileNotFoundError:
+        return None
+
+
+class _StagedFile:
+    def __init__(self, filename: Path, temp_filename: Path, mode: str) -> None:
+        assert mode in ("w", "wb")
+        self.filename = filename
+        self.temp_filename = temp_filename
+        # unbuffered, so flushing self.f puts all data in the file
+        self.hashing_writer = _HashingWriter(open(temp_filename, "wb", buffering=0))
+        f = io.BufferedWriter(self.hashing_writer)  # type: IO[Any]
+        if mode == "w":
+            f = io.TextIOWrapper(f)
+        self.f = f
+
+    def discard(self) -> None:
+        try:
+            self.f.close()
+            self.temp_filename.unlink()
+        except BaseException:
+            pass
+
+    def is_unchanged(self) -> bool:
+        sha256 = _file_sha256(self.filename, self.hashing_writer.size)
+        return sha256 == self.hashing_writer.sha256.digest()
+
+
+def _join_filenames(staged_files: List[_StagedFile]) -> str:
+    return ", ".join(str(staged_file.filename) for staged_file in staged_files)
+
+
+class FilesTransaction:
+    """Write several files, and publish them together.
+
+    Files are written to temporary files first. On commit, they are
+    synced to disk, then the ones with new content replace the
+    originals with os.replace, and the others are left untouched,
+    preserving their mtime. On rollback, or if an exception occurs
+    in the with block, the temporary files are removed.
+    """
+
+    def __init__(self, suffix: str = ".tmp") -> None:
+        self.suffix = suffix
+        self._staged = []  # type: List[_StagedFile]
+
+    @contextlib.contextmanager
+    def open(self, filename: Path, mode: str = "w") -> Iterator[IO[Any]]:
+        temp_filename = filename.with_suffix(filename.suffix + self.suffix)
+        assert not temp_filename.exists()
+        staged_file = _StagedFile(filename, temp_filename, mode)
+        self._staged.append(staged_file)
+        try:
+            yield staged_file.f
+        except BaseException:
+            self._staged.remove(staged_file)
+            staged_file.discard()
+            raise
+        # the file is kept open, to be synced on commit
+        staged_file.f.flush()
+
+    def commit(self) -> None:
+        try:
+            for staged_file in self._staged:
+                staged_file.f.flush()
+                os.fsync(staged_file.hashing_writer.fileno())
+                staged_file.f.close()
+        except BaseException:
+            self.rollback()
+            raise
+        created = []
+        updated = []
+        unchanged = []
+        for staged_file in self._staged:
+            if staged_file.is_unchanged():
+                unchanged.append(staged_file)
+            elif staged_file.filename.exists():
+                updated.append(staged_file)
+            else:
+                created.append(staged_file)
+        # publish
+        for staged_file in unchanged:
+            staged_file.temp_filename.unlink()
+        for staged_file in created + updated:
+            os.replace(staged_file.temp_filename, staged_file.filename)
+        self._staged = []
+        if created:
+            log_notice(f"Created {_join_filenames(created)}")
+        if updated:
+            log_notice(f"Updated {_join_filenames(updated)}")
+        if unchanged:
+            log_info(f"No change to {_join_filenames(unchanged)}")
+
+    def rollback(self) -> None:
+        for staged_file in self._staged:
+            staged_file.discard()
+        self._staged = []
+
+    def __enter__(self) -> "FilesTransaction":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+
 @contextlib.contextmanager
 def open_with_rollback(
     filename: Path, mode: str = "w", suffix: str = ".tmp"
 ) -> Iterator[IO[Any]]:
-    temp_filename = filename.with_suffix(filename.suffix + suffix)
-    assert not temp_filename.exists()
-    with open(temp_filename, mode) as f:
-        try:
+    """Write a file through a temporary file, replacing it on success.
+
+    The content is hashed while written, and if the file already has
+    the same content it is left untouched, preserving its mtime.
+    """
+    with FilesTransaction(suffix) as transaction:
+        with transaction.open(filename, mode) as f:
             yield f
-        except BaseException:
-            try:
-                f.close()
-                temp_filename.unlink()
-            except BaseException:
-                pass
-            raise
-        else:
-            f.close()
-            with open(temp_filename) as fafter:
-                after = fafter.read()
-            before = None  # type: Optional[str]
-            if filename.exists():
-                with open(filename) as fbefore:
-                    before = fbefore.read()
-                filename.unlink()
-            temp_filename.rename(filename)
-            if before is None:
-                log_notice(f"Created {filename}")
-            elif before != after:
-                log_notice(f"Updated {filename}")
-            else:
-                log_info(f"No change to {filename}")
+
+
+def store_cache_entry(entry_path: Path, entry: Any) -> None:
+    """Write a JSON cache entry, ignoring errors."""
+    try:
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        # write atomically, so concurrent runs never see partial entries
+        with tempfile.NamedTemporaryFile(
+            mode="w",
+            encoding="utf-8",
+            dir=entry_path.parent,
+            suffix=".tmp",
+            delete=False,
+        ) as f:
+            json.dump(entry, f, separators=(",", ":"))
+        os.replace(f.name, entry_path)
+    except OSError:
+        # the cache is an optimization, never fail because of it
+        pass
 
 
 _verbosity = 0
@@ -77,6 +245,42 @@ def log_error(msg: str) -> None:
     typer.secho(msg, fg=typer.colors.RED, err=True)
 
 
+def start_memory_tracing() -> None:
+    tracemalloc.start()
+
+
+def log_memory(msg: str) -> None:
+    if tracemalloc.is_tracing():
+        log_info(f"[memory] {msg}")
+
+
+def _format_size(size: int) -> str:
+    return f"{size / 1024 / 1024:.1f} MiB"
+
+
+@contextlib.contextmanager
+def trace_memory(stage: str) -> Iterator[None]:
+    """Report peak and retained memory of a stage, when tracing is enabled.
+
+    Both values are relative to the memory allocated when entering the
+    stage. On python < 3.9, the peak is the peak since tracing started.
+    """
+    if not tracemalloc.is_tracing():
+        yield
+        return
+    before, _ = tracemalloc.get_traced_memory()
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    try:
+        yield
+    finally:
+        current, peak = tracemalloc.get_traced_memory()
+        log_memory(
+            f"{stage}: peak {_format_size(peak - before)}, "
+            f"retained {_format_size(current - before)}"
+        )
+
+
 def check_call(cmd: Sequence[Union[str, Path]], cwd: Optional[Path] = None) -> int:
     try:
         return subprocess.check_call(cmd, cwd=cwd)
@@ -109,6 +313,16 @@ def comma_split(s: Optional[str]) -> List[str]:
     return [item for item in items if item]
 
 
+def get_default_cache_dir() -> Path:
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local"
+    elif sys.platform == "darwin":
+        base = Path.home() / "Library" / "Caches"
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "pip-deepfreeze"
+
+
 def make_project_name_with_extras(
     project_name: str, extras: Optional[Iterable[str]]
 ) -> str:
@@ -0,0 +1,38 @@
+from pathlib import Path
+from typing import List
+
+import typer
+from packaging.requirements import Requirement
+from packaging.utils import canonicalize_name
+
+from .compat import NormalizedName
+from .dependency_graph import DependencyGraph
+from .pip import pip_list
+from .project_name import get_project_name
+from .utils import log_error, make_project_name_with_extras
+
+
+def why(
+    python: str,
+    project_root: Path,
+    extras: List[NormalizedName],
+    dependency: NormalizedName,
+) -> None:
+    project_name = get_project_name(python, project_root)
+    graph = DependencyGraph(pip_list(python))
+    root_req = Requirement(make_project_name_with_extras(project_name, extras))
+    project_id = graph.get_id(project_name)
+    dependency_id = graph.get_id(dependency)
+    found = False
+    if project_id is not None and dependency_id is not None:
+        mask = graph.extras_mask(
+            project_id, (canonicalize_name(e) for e in root_req.extras)
+        )
+        for path in graph.paths(project_id, mask, dependency_id):
+            found = True
+            typer.echo(
+                " → ".join([str(root_req)] + [graph.edge_labels[e] for e in path])
+            )
+    if not found:
+        log_error(f"{dependency} is not a dependency of {root_req}.")
+        raise typer.Exit(1)
@@ -3,8 +3,13 @@ from __future__ import unicode_literals
 import os
 import subprocess
 import sys
+import threading
+from http.server import HTTPServer
 
 import pytest
+from packaging.requirements import Requirement
+
+from pip_deepfreeze.installed_dist import InstalledDistribution
 
 
 @pytest.fixture
@@ -49,6 +54,60 @@ def virtualenv_python_with_system_site_packages(tmp_path):
     return str(python)
 
 
+@pytest.fixture
+def make_dist():
+    """Return a function creating an InstalledDistribution, as pip_list_json
+    would report it."""
+
+    def _make_dist(name, requires=(), extra_requires=None):
+        extra_requires = extra_requires or {}
+        depends = [
+            [req.name, sorted(req.extras), extra]
+            for extra, reqs in [(None, requires)] + list(extra_requires.items())
+            for req in map(Requirement, reqs)
+        ]
+        return InstalledDistribution(
+            {
+                "metadata": {
+                    "name": name,
+                    "version": "1.0",
+                    "provides_extra": list(extra_requires),
+                },
+                "depends": depends,
+            }
+        )
+
+    return _make_dist
+
+
+@pytest.fixture
+def http_server():
+    """Return a function starting an http server on localhost, with a given
+    request handler class.
+
+    Keyword arguments are set as server attributes, for the handler to
+    use. Servers are stopped at the end of the test.
+    """
+    servers = []
+
+    def _http_server(handler_class, **attrs):
+        server = HTTPServer(("127.0.0.1", 0), handler_class)
+        server.url = "http://127.0.0.1:{}/".format(server.server_port)
+        for name, value in attrs.items():
+            setattr(server, name, value)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        servers.append(server)
+        return server
+
+    try:
+        yield _http_server
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+
+
 @pytest.fixture(scope="session")
 def testpkgs(tmp_path_factory):
     """Create test wheels and return the temp dir where they are stored."""
@@ -0,0 +1,190 @@
+import random
+
+import pytest
+
+from pip_deepfreeze.dependency_graph import BASE, DependencyGraph
+from pip_deepfreeze.list_installed_depends import (
+    list_installed_depends,
+    list_installed_depends_by_extra,
+    list_installed_depends_masks,
+)
+from pip_deepfreeze.tree import _LazyTree
+
+
+@pytest.fixture
+def installed_dists(make_dist):
+    dists = [
+        make_dist("theproject", ["pkga"], {"b": ["pkgb"], "c": ["pkgd[c]"]}),
+        make_dist("pkga"),
+        make_dist("pkgb", ["pkga", "missing"]),
+        make_dist("pkgc"),
+        make_dist("pkgd", ["pkgd-base"], {"b": ["pkgb"], "c": ["pkgc", "theproject"]}),
+        make_dist("pkgd-base"),
+        make_dist("unrelated", ["pkgd[b,c]"]),
+    ]
+    return {dist.name: dist for dist in dists}
+
+
+def test_graph(installed_dists):
+    graph = DependencyGraph(installed_dists)
+    assert len(graph) == len(installed_dists) + 1
+    missing = graph.get_id("missing")
+    assert missing is not None
+    assert not graph.is_installed(missing)
+    assert graph.get_id("notthere") is None
+    pkgd = graph.get_id("pkgd")
+    assert graph.extras[pkgd] == ["b", "c"]
+    assert graph.extras_mask(pkgd, ["c", "unknown"]) == BASE | 4
+    assert [graph.edge_labels[e] for e in graph.edges(pkgd)] == ["pkgd-base"]
+    assert [graph.edge_labels[e] for e in graph.edges(pkgd, BASE | 4)] == [
+        "pkgd-base",
+        "pkgc",
+        "theproject",
+    ]
+    visited = graph.closure(graph.get_id("unrelated"))
+    assert {graph.names[i] for i, mask in enumerate(visited) if mask} == {
+        "unrelated",
+        "pkgd",
+        "pkgd-base",
+        "pkga",
+        "pkgb",
+        "pkgc",
+        "missing",
+        "theproject",
+    }
+    assert visited[pkgd] == BASE | 2 | 4
+
+
+def test_list_installed_depends(installed_dists):
+    assert list_installed_depends(installed_dists, "theproject") == {"pkga"}
+    assert list_installed_depends(installed_dists, "theproject", ["b"]) == {
+        "pkga",
+        "pkgb",
+    }
+    assert list_installed_depends(installed_dists, "theproject", ["c,b"]) == {
+        "pkga",
+        "pkgb",
+        "pkgc",
+        "pkgd",
+        "pkgd-base",
+    }
+    assert list_installed_depends(installed_dists, "theproject", ["x"]) == {"pkga"}
+    assert list_installed_depends(installed_dists, "notthere") == set()
+    assert list_installed_depends_by_extra(installed_dists, "theproject") == {
+        None: {"pkga"},
+        "b": {"pkgb"},
+        "c": {"pkgc", "pkgd", "pkgd-base"},
+    }
+
+
+def test_build_tree(installed_dists):
+    graph = DependencyGraph(installed_dists)
+    root = _LazyTree(graph).root("unrelated", "unrelated", ())
+    assert [child.req for child in root.children] == ["pkgd[b,c]"]
+    pkgd = root.children[0]
+    assert sorted(child.req for child in pkgd.children) == [
+        "pkgb",
+        "pkgc",
+        "pkgd-base",
+        "theproject",
+    ]
+    pkgb = next(child for child in pkgd.children if child.req == "pkgb")
+    assert [child.req for child in pkgb.children] == ["pkga", "missing"]
+    assert pkgb.children[1].dist is None
+    theproject = next(child for child in pkgd.children if child.req == "theproject")
+    # pkga is shared
+    assert theproject.children[0] is pkgb.children[0]
+
+
+def test_deep_graph(make_dist):
+    # no recursion limit
+    n = 5000
+    dists = [make_dist(f"pkg{i}", [f"pkg{i + 1}"]) for i in range(n)]
+    installed_dists = {dist.name: dist for dist in dists}
+    assert len(list_installed_depends(installed_dists, "pkg0")) == n - 1
+    graph = DependencyGraph(installed_dists)
+    node = _LazyTree(graph).root("pkg0", "pkg0", ())
+    depth = 0
+    while node.children:
+        node = node.children[0]
+        depth += 1
+    # the last one requires a distribution that is not installed
+    assert depth == n
+
+
+def test_list_installed_depends_by_extra_random(make_dist):
+    rnd = random.Random(42)
+    names = [f"pkg{i}" for i in range(60)]
+    extra_names = ["x", "y", "z"]
+
+    def random_reqs():
+        return [
+            rnd.choice(names + ["missing"])
+            + ("[" + rnd.choice(extra_names) + "]" if rnd.random() < 0.3 else "")
+            for _ in range(rnd.randint(0, 3))
+        ]
+
+    for _ in range(20):
+        dists = [
+            make_dist(name, random_reqs(), {e: random_reqs() for e in extra_names})
+            for name in names
+        ]
+        installed_dists = {dist.name: dist for dist in dists}
+        base = list_installed_depends(installed_dists, "pkg0")
+        expected = {None: base}
+        for extra in extra_names:
+            expected[extra] = (
+                list_installed_depends(installed_dists, "pkg0", [extra]) - base
+            )
+        assert list_installed_depends_by_extra(installed_dists, "pkg0") == expected
+
+
+def test_dependents(installed_dists):
+    graph = DependencyGraph(installed_dists)
+    pkgb = graph.get_id("pkgb")
+    assert sorted(
+        graph.names[graph.edge_sources[e]] for e in graph.dependents(pkgb)
+    ) == ["pkgd", "theproject"]
+    ancestors = graph.ancestors(graph.get_id("pkgc"))
+    assert {graph.names[i] for i, reached in enumerate(ancestors) if reached} == {
+        "pkgc",
+        "pkgd",
+        "theproject",
+        "unrelated",
+    }
+
+
+def test_paths(installed_dists):
+    graph = DependencyGraph(installed_dists)
+
+    def paths(name, extras, target):
+        dist_id = graph.get_id(name)
+        return [
+            [graph.edge_labels[e] for e in path]
+            for path in graph.paths(
+                dist_id, graph.extras_mask(dist_id, extras), graph.get_id(target)
+            )
+        ]
+
+    assert paths("theproject", [], "pkga") == [["pkga"]]
+    assert paths("theproject", [], "pkgc") == []
+    assert paths("theproject", ["b", "c"], "pkga") == [
+        ["pkga"],
+        ["pkgb", "pkga"],
+    ]
+    assert paths("theproject", ["c"], "pkgc") == [["pkgd[c]", "pkgc"]]
+    # pkgd[c] requires theproject without extras, so not through theproject[b]
+    assert paths("unrelated", [], "pkgb") == [["pkgd[b,c]", "pkgb"]]
+    assert paths("unrelated", [], "missing") == [["pkgd[b,c]", "pkgb", "missing"]]
+
+
+def test_list_installed_depends_masks(installed_dists):
+    extras, depends_masks = list_installed_depends_masks(installed_dists, "theproject")
+    assert extras == ["b", "c"]
+    assert depends_masks == {
+        "pkga": BASE,
+        "pkgb": 2,
+        "pkgc": 4,
+        "pkgd": 4,
+        "pkgd-base": 4,
+    }
@@ -0,0 +1,110 @@
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from pip_deepfreeze.http_cache import CachingHttpClient
+from pip_deepfreeze.http_session import HttpSession
+from pip_deepfreeze.req_file_parser import RequirementsFileParserError, parse
+
+
+class RequirementsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if_none_match = self.headers.get("If-None-Match")
+        self.server.requests.append((self.path, if_none_match))
+        if self.path != "/reqs.txt":
+            self.send_response(404)
+            self.end_headers()
+        elif if_none_match == self.server.etag:
+            self.send_response(304)
+            self.end_headers()
+        else:
+            body = self.server.text.encode()
+            self.send_response(200)
+            self.send_header("ETag", self.server.etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(http_server):
+    return http_server(
+        RequirementsHandler,
+        text="req1==1.0",
+        etag='"v1"',
+        requests=[],  # list of (path, If-None-Match header)
+    )
+
+
+@pytest.fixture
+def http_session():
+    with HttpSession() as http_session:
+        yield http_session
+
+
+def _parse_reqs(url, session):
+    return [line.requirement for line in parse(url + "reqs.txt", session=session)]
+
+
+def test_conditional_request(server, http_session, tmp_path):
+    session = CachingHttpClient(http_session, tmp_path)
+    assert _parse_reqs(server.url, session) == ["req1==1.0"]
+    assert server.requests == [("/reqs.txt", None)]
+    # not modified, served from cache after revalidation
+    assert _parse_reqs(server.url, session) == ["req1==1.0"]
+    assert server.requests[-1] == ("/reqs.txt", '"v1"')
+    # modified
+    server.text = "req1==2.0"
+    server.etag = '"v2"'
+    assert _parse_reqs(server.url, session) == ["req1==2.0"]
+    assert server.requests[-1] == ("/reqs.txt", '"v1"')
+    assert _parse_reqs(server.url, session) == ["req1==2.0"]
+    assert server.requests[-1] == ("/reqs.txt", '"v2"')
+    assert len(server.requests) == 4
+
+
+def test_max_age(server, http_session, tmp_path):
+    session = CachingHttpClient(http_session, tmp_path, max_age=3600)
+    assert _parse_reqs(server.url, session) == ["req1==1.0"]
+    server.text = "req1==2.0"
+    server.etag = '"v2"'
+    assert _parse_reqs(server.url, session) == ["req1==1.0"]
+    assert len(server.requests) == 1
+
+
+def test_offline(server, http_session, tmp_path):
+    offline_session = CachingHttpClient(http_session, tmp_path, offline=True)
+    with pytest.raises(RequirementsFileParserError) as e:
+        _parse_reqs(server.url, offline_session)
+    assert "not in the http cache" in str(e.value)
+    session = CachingHttpClient(http_session, tmp_path)
+    assert _parse_reqs(server.url, session) == ["req1==1.0"]
+    server.text = "req1==2.0"
+    server.etag = '"v2"'
+    # stale entry is served
+    assert _parse_reqs(server.url, offline_session) == ["req1==1.0"]
+    assert len(server.requests) == 1
+
+
+def test_not_found(server, http_session, tmp_path):
+    session = CachingHttpClient(http_session, tmp_path)
+    with pytest.raises(RequirementsFileParserError) as e:
+        list(parse(server.url + "notfound.txt", session=session))
+    assert "Could not open requirements file" in str(e.value)
+    assert not list(tmp_path.iterdir())
+
+
+def test_userinfo_not_stored(server, http_session, tmp_path):
+    session = CachingHttpClient(http_session, tmp_path)
+    url = server.url.replace("://", "://user:s3cr3t@")
+    assert _parse_reqs(url, session) == ["req1==1.0"]
+    (entry,) = tmp_path.iterdir()
+    assert "s3cr3t" not in entry.name
+    assert "s3cr3t" not in entry.read_text()
+    # the entry is used whatever the credentials
+    url = server.url.replace("://", "://user:0th3r@")
+    assert _parse_reqs(url, session) == ["req1==1.0"]
+    assert server.requests == [("/reqs.txt", None), ("/reqs.txt", '"v1"')]
@@ -0,0 +1,51 @@
+from http.server import BaseHTTPRequestHandler
+
+import httpx
+import pytest
+
+from pip_deepfreeze.http_session import HttpSession
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests += 1
+        if self.server.requests <= self.server.failures:
+            self.send_response(503)
+            self.end_headers()
+        else:
+            body = b"req1"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def flaky_server(request, http_server):
+    return http_server(FlakyHandler, failures=request.param, requests=0)
+
+
+@pytest.mark.parametrize("flaky_server", [0, 2], indirect=True)
+def test_retry(flaky_server):
+    with HttpSession(retries=2, backoff_factor=0) as session:
+        resp = session.get(flaky_server.url + "reqs.txt")
+        resp.raise_for_status()
+        assert resp.text == "req1"
+
+
+@pytest.mark.parametrize("flaky_server", [3], indirect=True)
+def test_retry_exhausted(flaky_server):
+    with HttpSession(retries=2, backoff_factor=0) as session:
+        resp = session.get(flaky_server.url + "reqs.txt")
+        assert resp.status_code == 503
+    assert flaky_server.requests == 3
+
+
+def test_connection_error():
+    with HttpSession(retries=1, backoff_factor=0) as session:
+        with pytest.raises(httpx.TransportError):
+            # nothing listens on port 9 (discard) on test machines
+            session.get("http://127.0.0.1:9/reqs.txt")
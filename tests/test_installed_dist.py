@@ -0,0 +1,54 @@
+import pytest
+from packaging.requirements import Requirement
+
+from pip_deepfreeze.installed_dist import Dependency, DirectUrl, InstalledDistribution
+
+
+def test_installed_dist():
+    dist = InstalledDistribution(
+        {
+            "metadata": {
+                "name": "Pkg_A",
+                "version": "1.0",
+                "requires_dist": ["pkgb<2", "pkgc ; extra == 'C'"],
+                "provides_extra": ["C", "D"],
+            },
+            "depends": [["pkgb", [], None], ["Pkg.C", ["x", "a"], "C"]],
+            "direct_url": {
+                "url": "https://g.c/o/r",
+                "vcs_info": {"vcs": "git", "commit_id": "abc"},
+            },
+        }
+    )
+    assert dist.name == "pkg-a"
+    assert dist.version == "1.0"
+    assert dist.depends == {
+        None: [Dependency("pkgb", (), "pkgb")],
+        "c": [Dependency("pkg-c", ("a", "x"), "Pkg.C[x,a]")],
+        "d": [],
+    }
+    assert repr(dist.requires) == repr([Requirement("pkgb")])
+    assert repr(dist.extra_requires) == repr(
+        {"c": [Requirement("Pkg.C[a,x]")], "d": []}
+    )
+    assert repr(dist.requires_dist) == repr(
+        [Requirement("pkgb<2"), Requirement("pkgc ; extra == 'C'")]
+    )
+    # lazy fields are decoded once
+    assert dist.requires_dist[0] is dist.requires_dist[0]
+    assert dist.requires is dist.requires
+    assert dist.extra_requires is dist.extra_requires
+    assert isinstance(dist.direct_url, DirectUrl)
+    assert dist.direct_url is dist.direct_url
+    assert str(dist.direct_url) == "git+https://g.c/o/r@abc"
+    with pytest.raises(AttributeError):
+        dist.foo = "bar"
+
+
+def test_installed_dist_minimal():
+    dist = InstalledDistribution({"metadata": {"name": "pkga", "version": "1.0"}})
+    assert dist.depends == {None: []}
+    assert dist.requires == []
+    assert dist.extra_requires == {}
+    assert dist.requires_dist == []
+    assert dist.direct_url is None
@@ -26,7 +26,7 @@ PIP_LIST_JSON = os.path.join(
                         "version": "0.0.0",
                         "requires_dist": ["pkga<0.0.1"],
                     },
-                    "requires": ["pkga"],
+                    "depends": [["pkga", [], None]],
                 },
                 {"metadata": {"name": "pkgc", "version": "0.0.2"}},
                 {
@@ -40,8 +40,11 @@ PIP_LIST_JSON = os.path.join(
                         ],
                         "provides_extra": ["b", "c"],
                     },
-                    "requires": ["pkga"],
-                    "extra_requires": {"c": ["pkgc"], "b": ["pkgb"]},
+                    "depends": [
+                        ["pkga", [], None],
+                        ["pkgb", [], "b"],
+                        ["pkgc", [], "c"],
+                    ],
                 },
                 {
                     "metadata": {
@@ -49,7 +52,7 @@ PIP_LIST_JSON = os.path.join(
                         "version": "0.0.0",
                         "requires_dist": ["pkgd[b,c]"],
                     },
-                    "requires": ["pkgd[b,c]"],
+                    "depends": [["pkgd", ["b", "c"], None]],
                 },
             ],
         )
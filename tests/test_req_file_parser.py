@@ -1,13 +1,21 @@
+import codecs
 import os
 import textwrap
+import threading
 
 import pytest
 
+from pip_deepfreeze import req_file_parser
 from pip_deepfreeze.req_file_parser import (
     OptionParsingError,
     RequirementLine,
     RequirementsFileParserError,
+    _auto_decode,
     _file_or_url_join,
+    _iter_file_lines,
+    _parse_line,
+    _parse_line_with_options,
+    _preprocess_lines,
     parse,
     parse_lines,
 )
@@ -44,6 +52,17 @@ def test_basic(tmp_path):
     assert lines[0].lineno == 2
 
 
+def test_parsed_lines_are_compact(tmp_path):
+    reqs = tmp_path / "reqs.txt"
+    reqs.write_text("# comment\n-f ./links\nreq1\n-r subreqs.txt")
+    (tmp_path / "subreqs.txt").write_text("")
+    lines = list(parse(str(reqs), reqs_only=False))
+    assert len(lines) == 4
+    for line in lines:
+        assert not hasattr(line, "__dict__")
+        assert line.filename is lines[0].filename
+
+
 def test_parse_lines(tmp_path):
     """Basic test for parse_lines."""
     lines = ["req1\n", "-r subreqs.txt\n"]
@@ -161,6 +180,182 @@ def test_http_url_notfound(tmp_path):
     assert "notfound.txt" in str(e.value)
 
 
+def test_prefetch_order(tmp_path):
+    (tmp_path / "reqs.txt").write_text("req1\n-r sub1.txt\nreq2\n-c sub2.txt\nreq3")
+    (tmp_path / "sub1.txt").write_text("req11\n-r sub11.txt\nreq12")
+    (tmp_path / "sub11.txt").write_text("req111")
+    (tmp_path / "sub2.txt").write_text("req21\n-r sub11.txt")
+    reqs = str(tmp_path / "reqs.txt")
+    expected = [
+        (line.filename, line.lineno, line.raw_line)
+        for line in parse(reqs, reqs_only=False)
+    ]
+    assert [
+        (line.filename, line.lineno, line.raw_line)
+        for line in parse(reqs, reqs_only=False, prefetch=True)
+    ] == expected
+    assert [line.requirement for line in parse(reqs, prefetch=True)] == [
+        "req1",
+        "req11",
+        "req111",
+        "req12",
+        "req2",
+        "req21",
+        "req111",
+        "req3",
+    ]
+    assert [line.is_constraint for line in parse(reqs, prefetch=True)] == [
+        False,
+        False,
+        False,
+        False,
+        False,
+        True,
+        False,
+        False,
+    ]
+
+
+class ConcurrentMockHttpSession:
+    """A mock session that requires n concurrent requests to respond."""
+
+    def __init__(self, n):
+        self.barrier = threading.Barrier(n, timeout=10)
+
+    def get(self, url):
+        self.barrier.wait()
+        return MockHttpResponse(url, url.rsplit("/", 1)[-1][: -len(".txt")])
+
+
+def test_prefetch_concurrent(tmp_path):
+    reqs = tmp_path / "reqs.txt"
+    reqs.write_text(
+        textwrap.dedent(
+            """\
+            -r http://e.c/req1.txt
+            -c http://e.c/req2.txt
+            -r http://e.c/req3.txt
+            """
+        )
+    )
+    lines = list(parse(str(reqs), session=ConcurrentMockHttpSession(3), prefetch=True))
+    assert [line.requirement for line in lines] == ["req1", "req2", "req3"]
+
+
+def test_prefetch_error(tmp_path):
+    reqs = tmp_path / "reqs.txt"
+    reqs.write_text("req1\n-r notfound.txt")
+    lines = parse(str(reqs), prefetch=True)
+    assert next(lines).requirement == "req1"
+    with pytest.raises(RequirementsFileParserError) as e:
+        next(lines)
+    assert "notfound.txt" in str(e.value)
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_diamond_include(tmp_path, monkeypatch, prefetch):
+    (tmp_path / "reqs.txt").write_text("-r web.txt\n-r worker.txt\n-c ./base.txt")
+    (tmp_path / "web.txt").write_text("web\n-c base.txt")
+    (tmp_path / "worker.txt").write_text("worker\n-c base.txt")
+    (tmp_path / "base.txt").write_text("base==1.0")
+    opened = []
+    get_file_lines = req_file_parser._get_file_lines
+
+    def _get_file_lines(url, session):
+        opened.append(os.path.basename(url))
+        return get_file_lines(url, session)
+
+    monkeypatch.setattr(req_file_parser, "_get_file_lines", _get_file_lines)
+    lines = list(parse(str(tmp_path / "reqs.txt"), prefetch=prefetch))
+    assert [line.requirement for line in lines] == [
+        "web",
+        "base==1.0",
+        "worker",
+        "base==1.0",
+        "base==1.0",
+    ]
+    # base.txt is streamed the first time, and kept the second time
+    assert sorted(opened) == [
+        "base.txt",
+        "base.txt",
+        "reqs.txt",
+        "web.txt",
+        "worker.txt",
+    ]
+
+
+class RecordingMockHttpSession:
+    """A mock session serving several urls, that records requested urls."""
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.requested = []
+
+    def get(self, url):
+        self.requested.append(url)
+        return MockHttpResponse(url, self.texts[url])
+
+
+def test_diamond_include_remote(tmp_path):
+    (tmp_path / "reqs.txt").write_text(
+        "-r http://e.c/web.txt\n-r http://e.c/worker.txt\n-c http://e.c/base.txt"
+    )
+    session = RecordingMockHttpSession(
+        {
+            "http://e.c/web.txt": "web\n-c base.txt",
+            "http://e.c/worker.txt": "worker\n-c base.txt",
+            "http://e.c/base.txt": "base==1.0",
+        }
+    )
+    lines = list(parse(str(tmp_path / "reqs.txt"), session=session, prefetch=True))
+    assert [line.requirement for line in lines] == [
+        "web",
+        "base==1.0",
+        "worker",
+        "base==1.0",
+        "base==1.0",
+    ]
+    assert sorted(session.requested) == [
+        "http://e.c/base.txt",
+        "http://e.c/web.txt",
+        "http://e.c/worker.txt",
+    ]
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_nested_include_streamed(tmp_path, monkeypatch, prefetch):
+    (tmp_path / "reqs.txt").write_text("req1\n-c constraints.txt")
+    (tmp_path / "constraints.txt").write_text("req2\nreq3")
+    events = []
+    get_file_lines = req_file_parser._get_file_lines
+
+    def _get_file_lines(url, session):
+        for line in get_file_lines(url, session):
+            events.append(("read", line))
+            yield line
+
+    monkeypatch.setattr(req_file_parser, "_get_file_lines", _get_file_lines)
+    for line in parse(str(tmp_path / "reqs.txt"), prefetch=prefetch):
+        events.append(("parsed", line.requirement))
+    # lines of the included file are parsed as they are read
+    assert events[-4:] == [
+        ("read", "req2"),
+        ("parsed", "req2"),
+        ("read", "req3"),
+        ("parsed", "req3"),
+    ]
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_circular_include(tmp_path, prefetch):
+    (tmp_path / "reqs.txt").write_text("req1\n-r subreqs.txt")
+    (tmp_path / "subreqs.txt").write_text("req2\n-c ./reqs.txt")
+    with pytest.raises(RequirementsFileParserError) as e:
+        list(parse(str(tmp_path / "reqs.txt"), prefetch=prefetch))
+    assert "Circular inclusion of " in str(e.value)
+    assert "subreqs.txt:2" in str(e.value)
+
+
 def test_subreq_notfound(tmp_path):
     reqs = tmp_path / "reqs.txt"
     reqs.write_text("-r notfound.txt")
@@ -376,6 +571,45 @@ def test_options(line, expected, tmp_path):
     assert lines[0].options == expected
 
 
+@pytest.mark.parametrize(
+    "line",
+    [
+        "",
+        "foo",
+        "foo==1.0",
+        "Foo_Bar.baz===1.0.post1",
+        "foo[x,y]>=1,<2",
+        "foo @ https://e.c/foo.tgz",
+        "foo @ git+https://e.c/foo@abc-def#egg=foo",
+        "foo ; python_version < '3.7'",
+        "foo-bar==1.0 ; python_version < '3.7'",
+        "https://e.c/foo-1.0.tgz",
+        "./foo-dir",
+        "foo\t-e ./bar",
+        "  foo==1.0  ",
+        "foo==1.0 --hash sha256:abc",
+        "foo==1.0 --hash=sha256:abc --hash=sha256:def",
+        "foo @ ./foo-dir -e ./bar",
+        "-e ./foo",
+        "--editable=./foo",
+        "-r other.txt",
+        "-c 'constraints with space.txt'",
+        "-i https://e.c/simple",
+        "--pre",
+        " -f ./links",
+    ],
+)
+def test_parse_line_fast_path(line):
+    """The fast path gives the same result as the options parser."""
+    args_str, opts, other_opts = _parse_line(line, "reqs.txt", 1, strict=False)
+    expected_args_str, expected_opts, expected_other_opts = _parse_line_with_options(
+        line, "reqs.txt", 1, strict=False
+    )
+    assert args_str == expected_args_str
+    assert vars(opts) == vars(expected_opts)
+    assert other_opts == expected_other_opts
+
+
 @pytest.mark.parametrize(
     "filename,base_filename,expected",
     [
@@ -393,5 +627,65 @@ def test_file_or_url_join(filename, base_filename, expected):
     assert _file_or_url_join(filename, base_filename) == expected
 
 
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b"\n",
+        b"req1\nreq2",
+        b"req1\r\nreq2\r\n",
+        b"req1\rreq2\n\n\nreq3",
+        b"req1\x0creq2\n",
+        "req1\n# h\u00e9llo\n".encode("utf-8"),
+        codecs.BOM_UTF8 + "req1\n# h\u00e9llo\n".encode("utf-8"),
+        codecs.BOM_UTF16_LE + "req1\r\n# h\u00e9llo\n".encode("utf-16-le"),
+        codecs.BOM_UTF16_BE + "req1\n# h\u00e9llo\n".encode("utf-16-be"),
+        codecs.BOM_UTF32_LE + "req1\n# h\u00e9llo\n".encode("utf-32-le"),
+        "# -*- coding: latin-1 -*-\nreq1\n# h\u00e9llo\n".encode("latin-1"),
+        "#\n# coding=latin-1\nreq1\n# h\u00e9llo\n".encode("latin-1"),
+    ],
+)
+def test_iter_file_lines(data, tmp_path):
+    reqs = tmp_path / "reqs.txt"
+    reqs.write_bytes(data)
+    assert list(_iter_file_lines(str(reqs))) == _auto_decode(data).splitlines()
+
+
+def test_iter_file_lines_decode_error(tmp_path):
+    reqs = tmp_path / "reqs.txt"
+    reqs.write_bytes(b"# coding: ascii\nreq\xe9")
+    with pytest.raises(RequirementsFileParserError) as e:
+        list(parse(str(reqs)))
+    assert "Could not open requirements file" in str(e.value)
+
+
+def test_preprocess_lines(monkeypatch):
+    monkeypatch.setenv("X_VERSION", "1.0")
+    lines = [
+        "# comment\n",
+        "req1==${X_VERSION}  # comment\n",
+        "req2 \\\n",
+        "  --hash h:v \\\n",
+        "# comment after continuation\n",
+        "",
+        "req3 \\\n",
+        "  ; python_version < '3'\n",
+        "req4 # comment \\\n",
+        "req5 \\",
+    ]
+    assert list(_preprocess_lines(lines)) == [
+        (1, "", "# comment"),
+        (2, "req1==1.0", "req1==${X_VERSION}  # comment"),
+        (
+            3,
+            "req2   --hash h:v",
+            "req2 \\\n  --hash h:v \\\n# comment after continuation",
+        ),
+        (6, "", ""),
+        (7, "req3   ; python_version < '3'", "req3 \\\n  ; python_version < '3'"),
+        # a comment does not stop continuation
+        (9, "req4", "req4 # comment \\\nreq5 \\"),
+    ]
+
+
 # TODO test constraints and nested constraints
-# TODO test auto-decode
@@ -59,6 +59,72 @@ def test_merge(in_reqs, frozen_reqs, upgrade_all, to_upgrade, expected, tmp_path
     )
 
 
+@pytest.mark.parametrize("jobs", [1, 3])
+def test_merge_multiple_frozen(tmp_path, jobs):
+    in_filename = tmp_path / "requirements.txt.in"
+    in_filename.write_text("pkga\npkgz")
+    frozen_filenames = []
+    for i in range(5):
+        frozen_filename = tmp_path / f"requirements-{i}.txt"
+        frozen_filename.write_text(f"pkg{i}a==1.0\npkg{i}b==1.0")
+        frozen_filenames.append(frozen_filename)
+    frozen_filenames.append(tmp_path / "requirements-missing.txt")
+    (tmp_path / "requirements-0.txt").write_text("pkga==1.0\n-r requirements-1.txt")
+    assert list(
+        prepare_frozen_reqs_for_upgrade(
+            frozen_filenames, in_filename, to_upgrade=["pkg2b"], jobs=jobs
+        )
+    ) == [
+        "pkga==1.0",
+        "pkg1a==1.0",
+        "pkg1b==1.0",
+        "pkg1a==1.0",
+        "pkg1b==1.0",
+        "pkg2a==1.0",
+        "pkg3a==1.0",
+        "pkg3b==1.0",
+        "pkg4a==1.0",
+        "pkg4b==1.0",
+        "pkgz",
+    ]
+
+
+def test_merge_result(tmp_path):
+    in_filename = tmp_path / "requirements.txt.in"
+    in_filename.write_text("-f ./links\npkga\n-c constraints.txt\n-r empty.txt")
+    (tmp_path / "constraints.txt").write_text("--pre\npkgb<2")
+    (tmp_path / "empty.txt").write_text("")
+    frozen_filename = tmp_path / "requirements.txt"
+    frozen_filename.write_text("pkga==1.0.0")
+    merged_reqs = prepare_frozen_reqs_for_upgrade([frozen_filename], in_filename)
+    assert merged_reqs.lines == ["-f ./links", "--pre", "pkga==1.0.0", "pkgb<2"]
+    assert list(merged_reqs) == merged_reqs.lines
+    assert [line.raw_line for line in merged_reqs.options_lines] == [
+        "-f ./links",
+        "--pre",
+    ]
+    assert merged_reqs.included_files == {
+        str(in_filename),
+        str(tmp_path / "constraints.txt"),
+        str(tmp_path / "empty.txt"),
+    }
+
+
+def test_merge_pruned(tmp_path):
+    in_filename = tmp_path / "requirements.txt.in"
+    in_filename.write_text("-f ./links\npkga\n-c constraints.txt")
+    (tmp_path / "constraints.txt").write_text("pkgb<2\nPkg_C>1\npkgd")
+    frozen_filename = tmp_path / "requirements.txt"
+    frozen_filename.write_text("pkga==1.0.0\npkge==1.0.0")
+    merged_reqs = prepare_frozen_reqs_for_upgrade([frozen_filename], in_filename)
+    lines, pruned_names = merged_reqs.pruned({"pkg-c"})
+    # options and frozen requirements are kept
+    assert lines == ["-f ./links", "pkga==1.0.0", "pkge==1.0.0", "Pkg_C>1"]
+    assert pruned_names == {"pkgb", "pkgd"}
+    # the full set is kept
+    assert merged_reqs.lines[-3:] == ["pkgb<2", "Pkg_C>1", "pkgd"]
+
+
 def test_merge_missing_in(tmp_path):
     in_filename = tmp_path / "requirements.txt.in"
     frozen_filename = tmp_path / "requirements.txt"
@@ -1,6 +1,13 @@
+import random
+
 import pytest
 
-from pip_deepfreeze.req_parser import get_req_name, get_req_names
+from pip_deepfreeze.req_parser import (
+    _get_req_name,
+    get_req_name,
+    get_req_names,
+    requirements_equivalent,
+)
 
 
 @pytest.mark.parametrize(
@@ -26,3 +33,96 @@ def test_get_req_name(requirement, expected):
 )
 def test_get_req_names(requirements, expected):
     assert get_req_names(requirements) == expected
+
+
+def _requirements_corpus():
+    """Generate requirement strings, mostly in pip freeze forms."""
+    rnd = random.Random(42)
+    names = [
+        "a",
+        "A",
+        "pkga",
+        "Pkg_A",
+        "pkg.a",
+        "pkg-a",
+        "p--a",
+        "-pkga",
+        "pkga-",
+        "9z",
+    ]
+    versions = ["1", "1.0", "1.0.0", "1!2.0", "1.0rc1", "1.0RC1", "1.0.post1"]
+    versions += ["1.0.dev2", "1.0a1.post2.dev3", "1.0+local.7", "1.0.*", "abc", ""]
+    urls = ["https://e.c/a.tgz", "git+https://g.c/o/r@1.0#egg=pkga", "https://e.c"]
+    urls += ["file:///tmp/a", "./a", "https://u:p@e.c/a", "https:///a", "a b"]
+    seps = ["==", "===", ">=", " == ", "=="]
+    suffixes = ["", " ", " ; python_version>'3'", ";python_version>'3'", "[x]"]
+    for _ in range(2000):
+        name = rnd.choice(names)
+        form = rnd.randrange(3)
+        if form == 0:
+            req = name
+        elif form == 1:
+            req = name + rnd.choice(seps) + rnd.choice(versions)
+        else:
+            req = name + rnd.choice([" @ ", "@", " @"]) + rnd.choice(urls)
+        if rnd.random() < 0.3:
+            req += rnd.choice(suffixes)
+        yield req
+
+
+@pytest.mark.parametrize("requirement", sorted(set(_requirements_corpus())))
+def test_get_req_name_fast_path(requirement):
+    """The fast path and the full parser give the same name."""
+    assert get_req_name(requirement) == _get_req_name(requirement)
+
+
+@pytest.mark.parametrize(
+    "requirement1,requirement2,expected",
+    [
+        ("pkga==1.0", "pkga==1.0", True),
+        ("PkgA==1.0", "pkga==1.0", True),
+        ("pkga==1.0", "Pkg_A==1.0", False),
+        ("Pkg_A==1.0", "pkg-a==1.0", True),
+        ("pkga==1.0", "pkga==1.0.0", True),
+        ("pkga==1.0", "pkga==1.0.1", False),
+        ("pkga==1.0", "pkga==1.0+local", False),
+        ("pkga==1.0rc1", "pkga==1.0RC1", True),
+        ("pkga==1.0", "pkga", False),
+        ("pkga==1.*", "pkga==1.*", True),
+        ("pkga[x,y]==1.0", "pkga[Y,x]==1", True),
+        ("pkga[x]==1.0", "pkga==1.0", False),
+        ("pkga==1.0", "pkga @ https://e.c/pkga-1.0.tgz", False),
+        ("pkga @ https://e.c/pkga.tgz", "PkgA @ HTTPS://E.C:443/pkga.tgz", True),
+        ("pkga @ https://e.c/pkga.tgz", "pkga @ https://e.c/PKGA.tgz", False),
+        ("pkga @ https://e.c/pkg%61.tgz", "pkga @ https://e.c/pkga.tgz", True),
+        (
+            "pkga @ git+https://g.c/o/r@abc",
+            "pkga @ git+https://G.C/o/r@abc#egg=pkga",
+            True,
+        ),
+        ("pkga @ git+https://g.c/o/r@abc", "pkga @ git+https://g.c/o/r@abd", False),
+        (
+            "pkga @ git+https://g.c/o/r@abc#subdirectory=a&egg=pkga",
+            "pkga @ git+https://g.c/o/r@abc#subdirectory=a",
+            True,
+        ),
+        (
+            "pkga @ git+https://g.c/o/r@abc#subdirectory=a",
+            "pkga @ git+https://g.c/o/r@abc#subdirectory=b",
+            False,
+        ),
+        (
+            "-e git+https://g.c/o/r@abc#egg=pkga",
+            "-e git+https://g.c/o/r@abc#egg=pkga",
+            True,
+        ),
+        (
+            "-e git+https://g.c/o/r@abc#egg=pkga",
+            "pkga @ git+https://g.c/o/r@abc",
+            False,
+        ),
+    ],
+)
+def test_requirements_equivalent(requirement1, requirement2, expected):
+    assert requirements_equivalent(requirement1, requirement2) is expected
+    assert requirements_equivalent(requirement2, requirement1) is expected
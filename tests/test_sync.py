@@ -1,11 +1,13 @@
+import os
 import subprocess
 import sys
 import textwrap
+from http.server import SimpleHTTPRequestHandler
 
 import pytest
 from typer.testing import CliRunner
 
-from pip_deepfreeze.__main__ import app
+from pip_deepfreeze.__main__ import MainOptions, app
 from pip_deepfreeze.pip import pip_freeze, pip_list
 from pip_deepfreeze.sync import sync
 
@@ -76,6 +78,30 @@ def test_python_not_found(tmp_path):
     assert "Python interpreter 'this-is-not-a-python' not found" in result.output
 
 
+@pytest.mark.parametrize(
+    "http_cache_option", [["--offline"], ["--http-cache-max-age", "60"]]
+)
+def test_sync_http_cache_options_no_cache_dir(
+    virtualenv_python, tmp_path, http_cache_option
+):
+    runner = CliRunner()
+    result = runner.invoke(
+        app,
+        [
+            "--python",
+            virtualenv_python,
+            "--project-root",
+            str(tmp_path),
+            "--no-cache-dir",
+            "sync",
+            *http_cache_option,
+        ],
+        obj=MainOptions(),
+    )
+    assert result.exit_code == 1
+    assert "cannot be used with --no-cache-dir" in result.output
+
+
 @pytest.fixture
 def editable_foobar_path(tmp_path):
     setup_py = tmp_path / "setup.py"
@@ -322,3 +348,109 @@ def test_sync_extras(virtualenv_python, testpkgs, tmp_path):
     assert "pkga" not in requirements_c_txt
     assert "pkgb" not in requirements_c_txt
     assert "pkgc==0.0.2\n" in requirements_c_txt
+
+
+class _DirectoryHandler(SimpleHTTPRequestHandler):
+    """Serve the server directory instead of the current directory."""
+
+    def translate_path(self, path):
+        path = super().translate_path(path)
+        return os.path.join(self.server.directory, os.path.relpath(path))
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_dir(tmp_path_factory, http_server):
+    """Serve a temp dir over http, and return it with its url."""
+    directory = tmp_path_factory.mktemp("http")
+    server = http_server(_DirectoryHandler, directory=str(directory))
+    return directory, server.url
+
+
+def test_sync_remote_constraints(virtualenv_python, testpkgs, tmp_path, http_dir):
+    """Remote requirements files are downloaded when no http session is given."""
+    http_dir_path, http_dir_url = http_dir
+    (http_dir_path / "constraints.txt").write_text("pkgc<0.0.3\n")
+    (tmp_path / "setup.py").write_text(
+        textwrap.dedent(
+            """\
+            from setuptools import setup
+            setup(name="theproject", install_requires=["pkgc"])
+            """
+        )
+    )
+    (tmp_path / "setup.cfg").write_text("[metadata]\nname = theproject\n")  # for perf
+    (tmp_path / "requirements.txt.in").write_text(
+        textwrap.dedent(
+            f"""\
+            --no-index
+            -f {testpkgs}
+            -c {http_dir_url}constraints.txt
+            """
+        )
+    )
+    sync(
+        virtualenv_python,
+        upgrade_all=False,
+        to_upgrade=[],
+        extras=[],
+        uninstall_unneeded=False,
+        project_root=tmp_path,
+    )
+    assert "pkgc==0.0.2\n" in (tmp_path / "requirements.txt").read_text()
+
+
+def test_sync_prune_constraints_new_dep(virtualenv_python, testpkgs, tmp_path, capsys):
+    (tmp_path / "setup.py").write_text(
+        textwrap.dedent(
+            """\
+            from setuptools import setup
+            setup(name="theproject")
+            """
+        )
+    )
+    (tmp_path / "setup.cfg").write_text("[metadata]\nname = theproject\n")  # for perf
+    (tmp_path / "requirements.txt.in").write_text(
+        textwrap.dedent(
+            f"""\
+            --no-index
+            -f {testpkgs}
+            pkgc<0.0.3
+            """
+        )
+    )
+    sync(
+        virtualenv_python,
+        upgrade_all=False,
+        to_upgrade=[],
+        extras=[],
+        uninstall_unneeded=False,
+        project_root=tmp_path,
+        prune_constraints=True,
+    )
+    assert "pkgc" not in pip_list(virtualenv_python)
+    # pkgc becomes a dependency, its constraint is pruned as it is not
+    # installed yet, then applied when installing again
+    (tmp_path / "setup.py").write_text(
+        textwrap.dedent(
+            """\
+            from setuptools import setup
+            setup(name="theproject", install_requires=["pkgc"])
+            """
+        )
+    )
+    capsys.readouterr()
+    sync(
+        virtualenv_python,
+        upgrade_all=False,
+        to_upgrade=[],
+        extras=[],
+        uninstall_unneeded=False,
+        project_root=tmp_path,
+        prune_constraints=True,
+    )
+    assert "Installing again with all constraints" in capsys.readouterr().err
+    assert "pkgc==0.0.2" in "\n".join(pip_freeze(virtualenv_python))
+    assert "pkgc==0.0.2\n" in (tmp_path / "requirements.txt").read_text()
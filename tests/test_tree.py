@@ -1,9 +1,14 @@
+import json
 import subprocess
 import textwrap
 
+import pytest
+import typer
 from typer.testing import CliRunner
 
 from pip_deepfreeze.__main__ import MainOptions, app
+from pip_deepfreeze.dependency_graph import DependencyGraph
+from pip_deepfreeze.tree import _RENDERERS, TreeFormat, _BufferedOutput, _LazyTree, tree
 
 
 def test_tree(virtualenv_python, testpkgs, tmp_path):
@@ -90,3 +95,187 @@ def test_tree_extras(virtualenv_python, testpkgs, tmp_path):
             └── pkgc (0.0.2)
         """
     )
+
+
+def _json_node(node_id, requirement, name, version, dependencies):
+    node = {
+        "id": node_id,
+        "requirement": requirement,
+        "name": name,
+        "version": version,
+        "direct_url": None,
+    }
+    if dependencies is None:
+        node["truncated"] = True
+    else:
+        node["dependencies"] = dependencies
+    return node
+
+
+def _json_nodes(*nodes):
+    return '{"nodes": [\n' + ",\n".join(json.dumps(node) for node in nodes) + "\n]}\n"
+
+
+@pytest.fixture
+def root(make_dist):
+    dists = [
+        make_dist("theproject", ["pkgb", "pkgc[x]", "missing"]),
+        make_dist("pkga"),
+        make_dist("pkgb", ["pkga"]),
+        make_dist("pkgc", ["pkga"], {"x": ["pkgb"]}),
+    ]
+    graph = DependencyGraph({dist.name: dist for dist in dists})
+    return _LazyTree(graph).root("theproject", "theproject", ())
+
+
+@pytest.mark.parametrize(
+    "format, expected",
+    [
+        (
+            TreeFormat.text,
+            """\
+            theproject (1.0)
+            ├── missing (✘ not installed)
+            ├── pkgb (1.0)
+            │   └── pkga (1.0)
+            └── pkgc[x] (1.0)
+                ├── pkga ⬆
+                └── pkgb ⬆
+            """,
+        ),
+        (
+            TreeFormat.json,
+            _json_nodes(
+                _json_node(0, "theproject", "theproject", "1.0", [1, 2, 3]),
+                _json_node(1, "missing", "missing", None, []),
+                _json_node(2, "pkgb", "pkgb", "1.0", [4]),
+                _json_node(3, "pkgc[x]", "pkgc", "1.0", [4, 2]),
+                _json_node(4, "pkga", "pkga", "1.0", []),
+            ),
+        ),
+        (
+            TreeFormat.dot,
+            """\
+            digraph {
+              n0 [label="theproject\\n1.0"];
+              n0 -> n1;
+              n0 -> n2;
+              n0 -> n3;
+              n1 [label="missing", color=red];
+              n2 [label="pkgb\\n1.0"];
+              n2 -> n4;
+              n3 [label="pkgc[x]\\n1.0"];
+              n3 -> n4;
+              n3 -> n2;
+              n4 [label="pkga\\n1.0"];
+            }
+            """,
+        ),
+    ],
+)
+def test_render(root, format, expected, capsys):
+    out = _BufferedOutput(chunk_size=10)
+    _RENDERERS[format](root, out, None)
+    out.flush()
+    assert capsys.readouterr().out == textwrap.dedent(expected)
+    if format == TreeFormat.json:
+        json.loads(textwrap.dedent(expected))
+
+
+@pytest.mark.parametrize(
+    "format, expected",
+    [
+        (
+            TreeFormat.text,
+            """\
+            theproject (1.0)
+            ├── missing (✘ not installed)
+            ├── pkgb (1.0)
+            └── pkgc[x] (1.0)
+            """,
+        ),
+        (
+            TreeFormat.json,
+            _json_nodes(
+                _json_node(0, "theproject", "theproject", "1.0", [1, 2, 3]),
+                _json_node(1, "missing", "missing", None, None),
+                _json_node(2, "pkgb", "pkgb", "1.0", None),
+                _json_node(3, "pkgc[x]", "pkgc", "1.0", None),
+            ),
+        ),
+        (
+            TreeFormat.dot,
+            """\
+            digraph {
+              n0 [label="theproject\\n1.0"];
+              n0 -> n1;
+              n0 -> n2;
+              n0 -> n3;
+              n1 [label="missing", color=red];
+              n2 [label="pkgb\\n1.0"];
+              n3 [label="pkgc[x]\\n1.0"];
+            }
+            """,
+        ),
+    ],
+)
+def test_render_depth(root, format, expected, capsys):
+    out = _BufferedOutput()
+    _RENDERERS[format](root, out, 1)
+    out.flush()
+    assert capsys.readouterr().out == textwrap.dedent(expected)
+
+
+def test_render_depth_expand_later(make_dist, capsys):
+    dists = [
+        make_dist("theproject", ["pkga", "pkgb"]),
+        make_dist("pkga", ["pkgb"]),
+        make_dist("pkgb", ["pkgc"]),
+        make_dist("pkgc"),
+    ]
+    graph = DependencyGraph({dist.name: dist for dist in dists})
+    root = _LazyTree(graph).root("theproject", "theproject", ())
+    out = _BufferedOutput()
+    _RENDERERS[TreeFormat.text](root, out, 2)
+    out.flush()
+    # pkgb is not expanded under pkga, so it is expanded when seen again
+    assert capsys.readouterr().out == textwrap.dedent(
+        """\
+        theproject (1.0)
+        ├── pkga (1.0)
+        │   └── pkgb (1.0)
+        └── pkgb (1.0)
+            └── pkgc (1.0)
+        """
+    )
+
+
+def test_render_depth_0(root, capsys):
+    out = _BufferedOutput()
+    _RENDERERS[TreeFormat.text](root, out, 0)
+    out.flush()
+    assert capsys.readouterr().out == "theproject (1.0)\n"
+    # nodes are only expanded when rendered
+    assert root._children is None
+
+
+def test_lazy_tree_subtree(make_dist):
+    dists = [
+        make_dist("theproject", ["pkgb"]),
+        make_dist("pkga"),
+        make_dist("pkgb", ["pkga"], {"x": ["pkgc"]}),
+        make_dist("pkgc"),
+    ]
+    tree = _LazyTree(DependencyGraph({dist.name: dist for dist in dists}))
+    root = tree.root("pkgb[x]", "pkgb", ("x",))
+    assert [child.req for child in root.sorted_children()] == ["pkga", "pkgc"]
+    assert len(tree.nodes) == 3
+    root = tree.root("notinstalled", "notinstalled", ())
+    assert root.dist is None
+    assert root.children == []
+
+
+def test_tree_invalid_root(tmp_path, capsys):
+    with pytest.raises(typer.Exit):
+        tree("python", tmp_path, [], root="foo[")
+    assert "Invalid --root 'foo['" in capsys.readouterr().err
@@ -1,9 +1,12 @@
+import os
 import sys
+import tracemalloc
 
 import pytest
 import typer
 
 from pip_deepfreeze.utils import (
+    FilesTransaction,
     check_call,
     check_output,
     comma_split,
@@ -16,6 +19,8 @@ from pip_deepfreeze.utils import (
     log_warning,
     make_project_name_with_extras,
     open_with_rollback,
+    start_memory_tracing,
+    trace_memory,
 )
 
 
@@ -55,6 +60,99 @@ def test_open_with_rollback_logging(tmp_path, capsys):
     assert capsys.readouterr().err == f"Updated {filename}\n"
 
 
+def test_open_with_rollback_unchanged(tmp_path):
+    filename = tmp_path / "thefile"
+    with open_with_rollback(filename) as f:
+        f.write("a\nb\n")
+    os.utime(filename, ns=(1_000_000_000, 1_000_000_000))
+    stat_before = filename.stat()
+    with open_with_rollback(filename) as f:
+        f.write("a\n")
+        f.write("b\n")
+    # not rewritten
+    stat_after = filename.stat()
+    assert stat_after.st_ino == stat_before.st_ino
+    assert stat_after.st_mtime_ns == stat_before.st_mtime_ns
+    assert [p.name for p in tmp_path.iterdir()] == ["thefile"]
+    # same size, other content
+    with open_with_rollback(filename) as f:
+        f.write("a\nc\n")
+    assert filename.read_text() == "a\nc\n"
+    assert filename.stat().st_mtime_ns != stat_before.st_mtime_ns
+    # binary mode
+    stat_before = filename.stat()
+    with open_with_rollback(filename, mode="wb") as f:
+        f.write(os.linesep.join(["a", "c", ""]).encode())
+    assert filename.stat().st_mtime_ns == stat_before.st_mtime_ns
+    assert [p.name for p in tmp_path.iterdir()] == ["thefile"]
+
+
+def test_files_transaction(tmp_path, capsys):
+    a = tmp_path / "a.txt"
+    b = tmp_path / "b.txt"
+    c = tmp_path / "c.txt"
+    b.write_text("b")
+    c.write_text("c")
+    with FilesTransaction() as transaction:
+        for filename, content in [(a, "a"), (b, "bb"), (c, "c")]:
+            with transaction.open(filename) as f:
+                f.write(content)
+        # nothing published yet
+        assert not a.exists()
+        assert b.read_text() == "b"
+    assert a.read_text() == "a"
+    assert b.read_text() == "bb"
+    assert c.read_text() == "c"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.txt", "b.txt", "c.txt"]
+    assert capsys.readouterr().err == (f"Created {a}\nUpdated {b}\nNo change to {c}\n")
+
+
+def test_files_transaction_fsync(tmp_path, monkeypatch):
+    synced_sizes = []
+
+    def fsync(fd):
+        synced_sizes.append(os.fstat(fd).st_size)
+
+    monkeypatch.setattr(os, "fsync", fsync)
+    a = tmp_path / "a.txt"
+    b = tmp_path / "b.bin"
+    with FilesTransaction() as transaction:
+        with transaction.open(a) as f:
+            f.write("a" * 10000)
+        with transaction.open(b, "wb") as f:
+            f.write(b"b" * 100)
+    # all data was in the temporary files when they were synced
+    assert synced_sizes == [10000, 100]
+
+
+def test_files_transaction_rollback(tmp_path):
+    a = tmp_path / "a.txt"
+    b = tmp_path / "b.txt"
+    b.write_text("b")
+    with pytest.raises(RuntimeError):
+        with FilesTransaction() as transaction:
+            with transaction.open(a) as f:
+                f.write("a")
+            with transaction.open(b) as f:
+                f.write("bb")
+            raise RuntimeError()
+    assert not a.exists()
+    assert b.read_text() == "b"
+    assert [p.name for p in tmp_path.iterdir()] == ["b.txt"]
+    # a file that failed to be written is not published
+    with FilesTransaction() as transaction:
+        with transaction.open(a) as f:
+            f.write("a")
+        try:
+            with transaction.open(b) as f:
+                f.write("bb")
+                raise RuntimeError()
+        except RuntimeError:
+            pass
+    assert a.read_text() == "a"
+    assert b.read_text() == "b"
+
+
 def test_log_debug(capsys):
     log_debug("debug")
     assert "debug" not in capsys.readouterr().err
@@ -88,6 +186,22 @@ def test_log_error(capsys):
     assert capsys.readouterr().err == "error\n"
 
 
+def test_trace_memory(capsys):
+    with trace_memory("stage"):
+        pass
+    assert capsys.readouterr().err == ""
+    start_memory_tracing()
+    try:
+        with trace_memory("stage"):
+            data = [str(i) for i in range(10000)]
+    finally:
+        tracemalloc.stop()
+    assert data
+    err = capsys.readouterr().err
+    assert err.startswith("[memory] stage: peak ")
+    assert "retained " in err
+
+
 def test_check_call(capsys):
     r = check_call([sys.executable, "-c", "print('toto')"])
     assert r == 0
@@ -0,0 +1,66 @@
+import subprocess
+import textwrap
+
+from typer.testing import CliRunner
+
+from pip_deepfreeze.__main__ import MainOptions, app
+
+
+def test_why(virtualenv_python, testpkgs, tmp_path):
+    (tmp_path / "setup.py").write_text(
+        textwrap.dedent(
+            """\
+            from setuptools import setup
+
+            setup(
+                name="theproject",
+                install_requires=["pkge"],
+                extras_require={"b": ["pkgb"]},
+            )
+            """
+        )
+    )
+    subprocess.check_call(
+        [
+            virtualenv_python,
+            "-m",
+            "pip",
+            "install",
+            "--no-index",
+            "-f",
+            testpkgs,
+            str(tmp_path) + "[b]",  # str required for py < 3.8 on windows
+        ]
+    )
+    runner = CliRunner(mix_stderr=False)
+    result = runner.invoke(
+        app,
+        ["-p", virtualenv_python, "-r", tmp_path, "why", "pkga"],
+        obj=MainOptions(),
+    )
+    assert result.exit_code == 0
+    assert result.stdout == textwrap.dedent(
+        """\
+        theproject → pkge → pkgd[b,c] → pkga
+        theproject → pkge → pkgd[b,c] → pkgb → pkga
+        """
+    )
+    result = runner.invoke(
+        app,
+        ["-p", virtualenv_python, "-r", tmp_path, "why", "-x", "b", "pkgb"],
+        obj=MainOptions(),
+    )
+    assert result.exit_code == 0
+    assert result.stdout == textwrap.dedent(
+        """\
+        theproject[b] → pkgb
+        theproject[b] → pkge → pkgd[b,c] → pkgb
+        """
+    )
+    result = runner.invoke(
+        app,
+        ["-p", virtualenv_python, "-r", tmp_path, "why", "pkgz"],
+        obj=MainOptions(),
+    )
+    assert result.exit_code == 1
+    assert "pkgz is not a dependency of theproject" in result.stderr